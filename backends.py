@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Render backend selection for the pixel routines (recolor, watermark removal, gradients).
+The NumPy implementations are used when NumPy is installed; otherwise, or with ASSET_BACKEND=python,
+the generators fall back to pure-Python reference implementations that produce the same pixels.
+"""
+
+import contextlib
+import os
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+BACKENDS = ("numpy", "python")
+# Overrides the automatic choice, e.g. ASSET_BACKEND=python to compare against the reference path
+ENV_VAR = "ASSET_BACKEND"
+
+_active = None
+
+def available():
+    """Backends usable in this environment."""
+    return [name for name in BACKENDS if name != "numpy" or np is not None]
+
+def _validate(name):
+    if name not in BACKENDS:
+        raise ValueError(f"unknown backend {name!r}; choose from {', '.join(BACKENDS)}")
+    if name not in available():
+        raise RuntimeError(f"the {name} backend needs NumPy (pip install numpy)")
+    return name
+
+def active():
+    """The backend in use: ASSET_BACKEND if set, else numpy when installed, else python."""
+    global _active
+    if _active is None:
+        _active = _validate(os.environ.get(ENV_VAR) or available()[0])
+    return _active
+
+def use(name):
+    """Switch every routine to the named backend for the rest of the process."""
+    global _active
+    _active = _validate(name)
+
+@contextlib.contextmanager
+def using(name):
+    """Temporarily switch backends (for side-by-side comparisons)."""
+    previous = active()
+    use(name)
+    try:
+        yield
+    finally:
+        use(previous)
+
+def require_numpy(feature):
+    """Fail clearly for features that only have a NumPy implementation."""
+    if np is None:
+        raise RuntimeError(f"{feature} needs NumPy (pip install numpy)")
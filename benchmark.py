@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the image-generation hot paths.
+Runs every generator on synthetic inputs from 16px up to 4K, records wall time and peak memory,
+and compares the results with a stored JSON baseline. Exits non-zero when a case regresses.
+Needs no network and no original artwork.
+"""
+
+from PIL import Image, ImageDraw
+import argparse
+import contextlib
+import ctypes
+import gc
+import io
+import json
+import multiprocessing
+import os
+import platform
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+import convert_icons
+import create_clean_icons
+import create_icons
+import create_screenshots
+from masks import MASK_CACHE
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+# Timings only mean something on the machine that produced them, so the baseline stays local
+BASELINE_PATH = os.path.join(SCRIPT_DIR, ".cache", "benchmark-baseline.json")
+
+ICON_SIZES = [16, 128, 512, 2048, 3840]
+SCREEN_SIZES = [(640, 400), (1280, 800), (3840, 2400)]
+QUICK_LIMIT = 1280
+
+DEFAULT_REPEAT = 5
+MIN_TIME = 0.5
+MAX_REPEAT = 1000
+DEFAULT_THRESHOLD = 0.25
+# Differences below this are timer noise, whatever the ratio
+NOISE_FLOOR = 0.001
+
+def _synthetic_photo(size):
+    """A blue X-style icon: blue rounded square with a white glyph, on transparency."""
+    img = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    draw.rounded_rectangle([0, 0, size - 1, size - 1], radius=max(1, size // 6), fill=(29, 155, 240, 255))
+    margin = size // 4
+    draw.line([margin, margin, size - margin, size - margin], fill=(255, 255, 255, 255), width=max(1, size // 10))
+    draw.line([margin, size - margin, size - margin, margin], fill=(255, 255, 255, 255), width=max(1, size // 10))
+    return img
+
+def _synthetic_artwork(size):
+    """Pink artwork with a white sparkle watermark in the bottom-right corner."""
+    img = Image.new('RGBA', (size, size), (220, 60, 120, 255))
+    draw = ImageDraw.Draw(img)
+    cx, cy, r = int(size * 0.92), int(size * 0.92), max(2, size // 40)
+    draw.polygon([(cx, cy - r), (cx + r // 3, cy), (cx, cy + r), (cx - r // 3, cy)], fill=(255, 255, 255, 255))
+    draw.polygon([(cx - r, cy), (cx, cy - r // 3), (cx + r, cy), (cx, cy + r // 3)], fill=(255, 255, 255, 255))
+    return img
+
+def _quietly(func, *args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args)
+
+def _reset_caches():
+    """Drop the per-process render caches so every repeat measures the real work."""
+    MASK_CACHE.clear()
+    create_screenshots._render_gradient_bg.cache_clear()
+
+def benchmark_cases(workdir, quick=False):
+    """Return [(name, setup)] for every hot path and input size; setup() builds the input and returns run."""
+    icon_sizes = [size for size in ICON_SIZES if not quick or size <= QUICK_LIMIT]
+    screen_sizes = [size for size in SCREEN_SIZES if not quick or size[0] <= QUICK_LIMIT]
+    color1, color2 = create_icons.GRADIENT_COLOR1, create_icons.GRADIENT_COLOR2
+    cases = []
+
+    for size in icon_sizes:
+        cases.append((f"create_gradient_background/{size}",
+                      lambda size=size: lambda: create_icons.create_gradient_background(size, color1, color2,
+                                                                                        int(size * 0.15))))
+
+    def icon_with_photo(size):
+        source_path = os.path.join(workdir, f"source-{size}.png")
+        _synthetic_photo(max(size, 64)).save(source_path, "PNG")
+        output_path = os.path.join(workdir, f"icon-{size}.png")
+        return lambda: _quietly(create_icons.create_icon_with_photo, source_path, output_path, size, color1, color2)
+
+    for size in icon_sizes:
+        cases.append((f"create_icon_with_photo/{size}", lambda size=size: icon_with_photo(size)))
+
+    def recolor(size):
+        img = _synthetic_photo(size)
+        return lambda: convert_icons.convert_blue_to_instagram(img)
+
+    for size in icon_sizes:
+        cases.append((f"convert_blue_to_instagram/{size}", lambda size=size: recolor(size)))
+
+    def clean(size):
+        img = _synthetic_artwork(size)
+        return lambda: create_clean_icons.remove_watermark(img.copy())
+
+    # The cleaner samples the background at (50, 50), so it only applies to full-size artwork
+    for size in [size for size in icon_sizes if size > 50]:
+        cases.append((f"remove_watermark/{size}", lambda size=size: clean(size)))
+
+    for width, height in screen_sizes:
+        cases.append((f"create_gradient_bg/{width}x{height}",
+                      lambda width=width, height=height: lambda: create_screenshots.create_gradient_bg(width, height)))
+
+    for index in range(1, 5):
+        cases.append((f"create_screenshot_{index}/{create_screenshots.WIDTH}x{create_screenshots.HEIGHT}",
+                      lambda index=index: getattr(create_screenshots, f"create_screenshot_{index}")))
+
+    return cases
+
+def _rss_peak_kb():
+    """Process RSS high-water mark in KiB, or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/status") as f:
+            return int(re.search(r"VmHWM:\s+(\d+)", f.read()).group(1))
+    except (OSError, AttributeError):
+        return None
+
+def _reset_rss_peak():
+    """Reset the RSS high-water mark (Linux 4.0+). Returns False if it cannot be reset."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def _release_free_heap():
+    """Hand freed heap back to the OS (glibc only) so earlier, bigger cases do not hide this one's growth."""
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+def _peak_memory(run):
+    """Peak memory of one call in bytes: the RSS growth where Linux can report it, else traced allocations.
+
+    Pillow allocates image buffers outside the Python allocator, so tracemalloc alone undercounts.
+    """
+    gc.collect()
+    _reset_caches()
+    _release_free_heap()
+    baseline_rss = _rss_peak_kb() if _reset_rss_peak() else None
+    tracemalloc.start()
+    try:
+        run()
+        traced = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    if baseline_rss is not None:
+        return max(traced, (_rss_peak_kb() - baseline_rss) * 1024)
+    return traced
+
+def _calibration_workload():
+    """A fixed mix of Pillow and NumPy work, timed next to every case to track machine speed."""
+    img = Image.linear_gradient("L").resize((512, 512)).convert("RGBA")
+    pixels = np.asarray(img).astype(np.int32)
+    Image.fromarray(np.clip(pixels * 3 // 2, 0, 255).astype(np.uint8), "RGBA").resize((256, 256), Image.LANCZOS)
+
+def _best_time(run, repeat, min_time=MIN_TIME):
+    times = []
+    # Fast cases keep going until they have run for min_time, like timeit's autorange
+    while len(times) < repeat or (sum(times) < min_time and len(times) < MAX_REPEAT):
+        _reset_caches()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return sorted(times)
+
+def measure(run, repeat=DEFAULT_REPEAT):
+    """Return the best and median wall time, peak memory, and the calibration time measured alongside."""
+    # One untimed call loads fonts, LUTs and imports so they do not count as the hot path
+    run()
+    _calibration_workload()
+    times = _best_time(run, repeat)
+    return {
+        "seconds": times[0],
+        "median": times[len(times) // 2],
+        "runs": len(times),
+        "calibration": _best_time(_calibration_workload, repeat, MIN_TIME / 2)[0],
+        "peak_bytes": _peak_memory(run),
+    }
+
+def _measure_case(name, workdir, quick, repeat):
+    """Worker entry point: build and measure one case in a fresh interpreter."""
+    setup = dict(benchmark_cases(workdir, quick))[name]
+    return measure(setup(), repeat)
+
+def run_benchmarks(pattern=None, repeat=DEFAULT_REPEAT, quick=False):
+    """Measure every case whose name contains pattern. Returns {name: measurement}.
+
+    Each case runs in its own spawned process, so allocator and cache state left behind by one case
+    (a 4K render grows the heap) cannot speed up or slow down the next.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        names = [name for name, _ in benchmark_cases(workdir, quick) if not pattern or pattern in name]
+        with multiprocessing.get_context("spawn").Pool(1, maxtasksperchild=1) as pool:
+            for name in names:
+                results[name] = pool.apply(_measure_case, (name, workdir, quick, repeat))
+                print(f"  {name:42} {results[name]['seconds'] * 1000:9.2f} ms  "
+                      f"{results[name]['peak_bytes'] / 2**20:8.1f} MiB", flush=True)
+    return results
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Return a list of regression messages for cases slower or bigger than baseline * (1 + threshold)."""
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        seconds, expected = result["seconds"], reference["seconds"]
+        # Scale the baseline by how fast the machine is right now compared with when it was recorded
+        if result.get("calibration") and reference.get("calibration"):
+            expected *= result["calibration"] / reference["calibration"]
+        if seconds > expected * (1 + threshold) and seconds - expected > NOISE_FLOOR:
+            regressions.append(f"{name}: {expected * 1000:.2f} ms -> {seconds * 1000:.2f} ms "
+                               f"(+{(seconds / expected - 1) * 100:.0f}%)")
+        peak, expected_peak = result["peak_bytes"], reference["peak_bytes"]
+        if expected_peak and peak > expected_peak * (1 + threshold) and peak - expected_peak > 2**20:
+            regressions.append(f"{name}: peak {expected_peak / 2**20:.1f} MiB -> {peak / 2**20:.1f} MiB "
+                               f"(+{(peak / expected_peak - 1) * 100:.0f}%)")
+    return regressions
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)["results"]
+
+def save_baseline(path, results):
+    """Merge results into the baseline file, so a filtered run only updates its own cases."""
+    merged = load_baseline(path) or {}
+    merged.update(results)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"machine": platform.platform(), "python": platform.python_version(),
+                   "results": dict(sorted(merged.items()))}, f, indent=2)
+        f.write("\n")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the image-generation hot paths.")
+    parser.add_argument("--filter", "-k", metavar="TEXT", help="only run cases whose name contains TEXT")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="minimum timed runs per case (best is kept)")
+    parser.add_argument("--quick", action="store_true", help=f"skip inputs larger than {QUICK_LIMIT}px")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown / memory growth as a fraction (default 0.25)")
+    parser.add_argument("--save-baseline", action="store_true", help="record these results as the baseline")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.filter, args.repeat, args.quick)
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f"\nSaved baseline for {len(results)} cases to {args.baseline}")
+        return
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to record one")
+        return
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold * 100:.0f}%:")
+        for message in regressions:
+            print(f"  {message}")
+        sys.exit(1)
+    print(f"\nNo regressions beyond {args.threshold * 100:.0f}% against {args.baseline}")
+
+if __name__ == "__main__":
+    main()
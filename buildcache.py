@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Content-addressed incremental build cache shared by the asset generators.
+Each output is keyed by a hash of everything it was built from; matching outputs are skipped.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+MANIFEST_PATH = os.path.join(SCRIPT_DIR, "assets", ".build-manifest.json")
+
+# Bump to invalidate every recorded target at once
+CACHE_VERSION = 1
+
+_file_digests = {}
+
+def file_digest(path):
+    """Return the sha256 of a file's bytes, memoized per (path, mtime, size) for this process."""
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    digest = _file_digests.get(memo_key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        digest = h.hexdigest()
+        _file_digests[memo_key] = digest
+    return digest
+
+def module_paths(*names):
+    """Return the source paths of generator modules next to this file, for use as script inputs."""
+    return [os.path.join(SCRIPT_DIR, f"{name}.py") for name in names]
+
+def target_key(files=(), params=None, scripts=(), fonts=()):
+    """Hash every input of a target: source files, parameters, generator scripts and fonts."""
+    h = hashlib.sha256()
+    h.update(json.dumps({"version": CACHE_VERSION, "params": params}, sort_keys=True, default=str).encode())
+    for group, paths in (("files", files), ("scripts", scripts), ("fonts", fonts)):
+        for path in paths:
+            h.update(f"{group}:{os.path.basename(path)}:".encode())
+            h.update(file_digest(path).encode() if os.path.exists(path) else b"missing")
+    return h.hexdigest()
+
+class BuildCache:
+    """Manifest of built outputs, their input keys and output digests."""
+
+    def __init__(self, manifest_path=MANIFEST_PATH, force=False):
+        self.manifest_path = manifest_path
+        self.force = force
+        self.results = []
+        self._started = time.perf_counter()
+        try:
+            with open(manifest_path) as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError):
+            self.manifest = {}
+
+    def _name(self, output):
+        """Manifest entries are stored relative to the manifest's directory."""
+        return os.path.relpath(os.path.abspath(output), os.path.dirname(self.manifest_path))
+
+    def is_fresh(self, output, key):
+        """True if output exists, is unmodified and was built from inputs hashing to key."""
+        if self.force:
+            return False
+        entry = self.manifest.get(self._name(output))
+        return (entry is not None and entry["key"] == key and os.path.exists(output)
+                and file_digest(output) == entry["output"])
+
+    def record(self, output, key):
+        """Remember that output was just built from inputs hashing to key."""
+        self.manifest[self._name(output)] = {"key": key, "output": file_digest(output)}
+
+    def refresh(self, output, previous_digest):
+        """Re-record output after an in-place rewrite that kept its content (e.g. a lossless recompression).
+
+        Only an entry that matched the old bytes is updated, so stale outputs stay stale. Returns True if updated.
+        """
+        entry = self.manifest.get(self._name(output))
+        if entry is None or entry["output"] != previous_digest:
+            return False
+        entry["output"] = file_digest(output)
+        return True
+
+    def build(self, output, key, build_fn):
+        """Run build_fn() unless output is fresh, and record the hit or miss. Returns True if built."""
+        if self.is_fresh(output, key):
+            self.results.append((output, "hit"))
+            return False
+        build_fn()
+        self.record(output, key)
+        self.results.append((output, "miss"))
+        return True
+
+    def save(self):
+        """Write the manifest atomically."""
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def report(self):
+        """Print per-target hit/miss status and the total time since the cache was opened."""
+        for output, status in self.results:
+            print(f"  [{status:4}] {self._name(output)}")
+        hits = sum(1 for _, status in self.results if status == "hit")
+        elapsed = (time.perf_counter() - self._started) * 1000
+        print(f"Build cache: {hits} hits, {len(self.results) - hits} misses ({elapsed:.0f} ms)")
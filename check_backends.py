@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Check that the NumPy and pure-Python render backends produce the same pixels.
+Every routine with two backends runs on synthetic inputs under each available backend; results are
+compared with each other within the routine's declared tolerance, and with golden digests stored
+in the repo, so a change to either backend (or a missing-NumPy install) is checked on its own.
+"""
+
+from PIL import Image, ImageDraw
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+
+import backends
+import convert_icons
+import create_clean_icons
+import create_screenshots
+import gradients
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+GOLDEN_PATH = os.path.join(SCRIPT_DIR, "backend-goldens.json")
+
+# Largest per-channel difference allowed between the backends. Everything is integer arithmetic
+# except the inpaint plane fit, where NumPy's lstsq and the normal equations may round differently.
+TOLERANCES = {
+    "gradient": 0,
+    "recolor": 0,
+    "watermark": 0,
+    "inpaint": 1,
+    "screenshot-bg": 0,
+}
+
+CUSTOM_MAPPING = {"blue_min": 60, "base": (120, 10, 40), "span": (120, 80, 90), "alpha_min": 1}
+
+def _noise(size, seed):
+    """Random RGBA pixels, so every branch of the recolor rule is hit."""
+    rng = random.Random(seed)
+    img = Image.new("RGBA", size)
+    img.putdata([tuple(rng.randrange(256) for _ in range(4)) for _ in range(size[0] * size[1])])
+    return img
+
+def _watermarked(size, seed):
+    """A pink-background icon with artwork in the middle and a sparkle in the bottom-right corner."""
+    rng = random.Random(seed)
+    width, height = size
+    img = Image.new("RGBA", size, (0, 0, 0, 255))
+    # A slightly noisy background, all inside BG_RANGE, so the inpaint fit has something to follow
+    img.putdata([(205 + (x + y) * 30 // (width + height) + rng.randrange(3), 50 + rng.randrange(30),
+                  105 + y * 30 // height, 255) for y in range(height) for x in range(width)])
+    draw = ImageDraw.Draw(img)
+    draw.ellipse((width // 5, height // 5, width * 3 // 5, height * 3 // 5), fill=(255, 255, 255, 255))
+    # Artwork reaching into the search window from outside it must survive
+    draw.rectangle((width // 2, height * 3 // 5, width * 3 // 4, height * 3 // 4), fill=(250, 250, 250, 255))
+    cx, cy, r = width * 9 // 10, height * 9 // 10, max(2, width // 30)
+    draw.polygon([(cx, cy - 2 * r), (cx + r // 2, cy - r // 2), (cx + 2 * r, cy), (cx + r // 2, cy + r // 2),
+                  (cx, cy + 2 * r), (cx - r // 2, cy + r // 2), (cx - 2 * r, cy), (cx - r // 2, cy - r // 2)],
+                 fill=(255, 240, 250, 255))
+    return img
+
+def cases():
+    """(name, routine, function) for every input; functions are rerun under each backend."""
+    stops = [(0, "#833ab4"), (0.5, "#fd1d1d"), (1, "#fcb045")]
+    for size in (1, 16, 97, (200, 64)):
+        for angle in (0, 45, 135, 270, 30):
+            label = size if isinstance(size, int) else f"{size[0]}x{size[1]}"
+            yield (f"gradient-{label}-{angle}", "gradient",
+                   lambda size=size, angle=angle: gradients.linear_gradient(size, ["#E1306C", "#c13584"], angle))
+    yield "gradient-3stop-128-45", "gradient", lambda: gradients.linear_gradient(128, stops, 45)
+    yield "gradient-3stop-120x80-200", "gradient", lambda: gradients.linear_gradient((120, 80), stops, 200)
+
+    for size, seed in (((64, 64), 1), ((97, 61), 2)):
+        label = f"{size[0]}x{size[1]}"
+        yield f"recolor-{label}", "recolor", lambda size=size, seed=seed: \
+            convert_icons.convert_blue_to_instagram(_noise(size, seed))
+        yield f"recolor-custom-{label}", "recolor", lambda size=size, seed=seed: \
+            convert_icons.convert_blue_to_instagram(_noise(size, seed), CUSTOM_MAPPING)
+
+    for size, seed in (((200, 200), 3), ((333, 257), 4), ((512, 512), 5)):
+        label = f"{size[0]}x{size[1]}"
+        yield f"watermark-{label}", "watermark", lambda size=size, seed=seed: \
+            create_clean_icons.remove_watermark(_watermarked(size, seed))
+        yield f"inpaint-{label}", "inpaint", lambda size=size, seed=seed: \
+            create_clean_icons.remove_watermark(_watermarked(size, seed), inpaint=True)
+
+    # Pure Python in both backends; covered by the goldens so a change to it is still caught
+    for size in ((640, 400), (1280, 800)):
+        yield (f"screenshot-bg-{size[0]}x{size[1]}", "screenshot-bg",
+               lambda size=size: create_screenshots.create_gradient_bg(*size))
+
+def digest(img):
+    return hashlib.sha256(f"{img.mode} {img.size[0]}x{img.size[1]}\n".encode() + img.tobytes()).hexdigest()[:16]
+
+def max_difference(a, b):
+    """Largest per-channel difference between two images, or None if their size or mode differs."""
+    if a.size != b.size or a.mode != b.mode:
+        return None
+    return max(abs(x - y) for x, y in zip(a.tobytes(), b.tobytes())) if a.tobytes() != b.tobytes() else 0
+
+def run(names):
+    """Render every case under each backend. Returns {name: (routine, {backend: (image, seconds)})}."""
+    results = {}
+    for name, routine, render in cases():
+        if names and not any(text in name for text in names):
+            continue
+        outputs = {}
+        for backend in backends.available():
+            with backends.using(backend):
+                start = time.perf_counter()
+                outputs[backend] = render(), time.perf_counter() - start
+        results[name] = routine, outputs
+    return results
+
+def load_goldens(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the NumPy and pure-Python render backends.")
+    parser.add_argument("names", nargs="*", help="only run cases whose name contains one of these")
+    parser.add_argument("--goldens", default=GOLDEN_PATH, help="golden digests JSON file")
+    parser.add_argument("--update", action="store_true", help="record the current outputs as the goldens")
+    args = parser.parse_args()
+
+    results = run(args.names)
+    goldens = load_goldens(args.goldens)
+    if goldens is None and not args.update:
+        print(f"No goldens at {args.goldens}; run with --update to record them")
+    failures = []
+    print(f"{'case':32} {'max diff':>8} {'numpy':>9} {'python':>9}  golden")
+    for name, (routine, outputs) in results.items():
+        images = [image for image, _ in outputs.values()]
+        tolerance = TOLERANCES[routine]
+        differences = [max_difference(images[0], image) for image in images[1:]]
+        if any(difference is None or difference > tolerance for difference in differences):
+            failures.append(f"{name}: backends differ by {differences} (tolerance {tolerance})")
+
+        # Goldens are exact and per backend, so each backend is checked even where only one is installed
+        golden = (goldens or {}).get(name, {})
+        changed = sorted(backend for backend, (image, _) in outputs.items()
+                         if backend in golden and digest(image) != golden[backend])
+        missing = sorted(set(outputs) - set(golden))
+        if goldens is not None and not args.update:
+            if changed:
+                failures.append(f"{name}: {', '.join(changed)} output differs from the golden digest")
+            if missing:
+                failures.append(f"{name}: no golden digest for {', '.join(missing)}; run with --update")
+
+        timings = [f"{outputs[backend][1] * 1000:7.1f}ms" if backend in outputs else f"{'-':>9}"
+                   for backend in backends.BACKENDS]
+        status = "CHANGED" if changed else "missing" if missing else "ok"
+        print(f"{name:32} {'size' if None in differences else max(differences, default=0):>8} "
+              f"{timings[0]} {timings[1]}  {status}")
+
+    if args.update:
+        # Digests of backends not installed here are kept
+        recorded = dict(goldens or {})
+        for name, (_, outputs) in results.items():
+            recorded[name] = {**recorded.get(name, {}), **{backend: digest(image)
+                                                            for backend, (image, _) in outputs.items()}}
+        with open(args.goldens, "w") as f:
+            json.dump(dict(sorted(recorded.items())), f, indent=2)
+            f.write("\n")
+        print(f"\nRecorded golden digests for {len(results)} cases in {os.path.relpath(args.goldens)}")
+
+    if failures:
+        print(f"\n{len(failures)} failure(s):")
+        for message in failures:
+            print(f"  {message}")
+        sys.exit(1)
+    print(f"\n{len(results)} cases agree across {', '.join(backends.available())}")
+
+if __name__ == "__main__":
+    main()
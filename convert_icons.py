@@ -4,8 +4,17 @@ Convert X extension icons from blue to Instagram pink/red colors.
 """
 
 from PIL import Image
+import argparse
+import hashlib
+import json
 import os
 
+from backends import np
+from buildcache import BuildCache, module_paths, target_key
+from tracing import traced
+import backends
+import tiles
+
 # Paths
 X_ICONS_DIR = "../x-bookmarks-exporter/assets/icons"
 OUTPUT_DIR = "assets/icons"
@@ -14,43 +23,132 @@ OUTPUT_DIR = "assets/icons"
 # Main pink: #E1306C (225, 48, 108)
 # Gradient: #833ab4 (purple) -> #fd1d1d (red) -> #fcb045 (orange)
 
-def convert_blue_to_instagram(img):
+# Blue -> pink mapping. Every field feeds the compiled lookup table's cache key.
+RECOLOR_MAPPING = {
+    "blue_min": 80,           # b must exceed this to count as blue
+    "base": (180, 30, 80),    # output color at intensity 0
+    "span": (75, 40, 50),     # added at full intensity (180-255, 30-70, 80-130)
+    "alpha_min": 10,          # pixels more transparent than this are left untouched
+}
+
+# Compiled lookup tables are cached here, keyed by the mapping parameters
+LUT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "recolor-luts")
+LUT_FORMAT_VERSION = 1
+
+_loaded_luts = {}
+
+def mapping_key(mapping):
+    """Return a stable hash of the mapping parameters."""
+    payload = json.dumps({"version": LUT_FORMAT_VERSION, "mapping": mapping}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+def _recolored_by_blue(mapping):
+    """The pink that replaces a blue pixel, for every blue value 0-255."""
+    # The new color depends only on the blue channel, so evaluate the rule once per blue value
+    # with the exact same float math as the original per-pixel loop
+    return [tuple(int(min(255, base + b / 255.0 * span)) for base, span in zip(mapping["base"], mapping["span"]))
+            for b in range(256)]
+
+def compile_recolor_lut(mapping=RECOLOR_MAPPING):
+    """Compile the per-pixel blue -> pink rule into a 256^3 RGB lookup table (indexed by r<<16 | g<<8 | b)."""
+    recolored = np.array(_recolored_by_blue(mapping), dtype=np.uint8)
+
+    r, g, b = np.ogrid[0:256, 0:256, 0:256]
+    # Detect blue-ish pixels (the background circle)
+    is_blue = (b > mapping["blue_min"]) & ((b > r) | (b > g))
+
+    lut = np.empty((256, 256, 256, 3), dtype=np.uint8)
+    lut[..., 0] = r
+    lut[..., 1] = g
+    lut[..., 2] = b
+    lut[is_blue] = np.broadcast_to(recolored[None, None, :, :], lut.shape)[is_blue]
+    return lut.reshape(-1, 3)
+
+def load_recolor_lut(mapping=RECOLOR_MAPPING):
+    """Return the compiled lookup table for mapping, compiling and caching it on disk on first use."""
+    key = mapping_key(mapping)
+    if key in _loaded_luts:
+        return _loaded_luts[key]
+
+    path = os.path.join(LUT_CACHE_DIR, f"{key}.npy")
+    if os.path.exists(path):
+        lut = np.load(path, mmap_mode='r')
+    else:
+        lut = compile_recolor_lut(mapping)
+        os.makedirs(LUT_CACHE_DIR, exist_ok=True)
+        # Write to a temp name first so a concurrent run never sees a partial table
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, lut)
+        os.replace(tmp_path, path)
+
+    _loaded_luts[key] = lut
+    return lut
+
+@traced
+def convert_blue_to_instagram(img, mapping=RECOLOR_MAPPING):
     """Convert blue pixels to Instagram pink/red."""
     img = img.convert("RGBA")
-    pixels = img.load()
-    width, height = img.size
+    if backends.active() == "python":
+        return _convert_blue_python(img, mapping)
+    lut = load_recolor_lut(mapping)
+    
+    pixels = np.array(img)
+    rgb = pixels[..., :3].astype(np.uint32)
+    index = (rgb[..., 0] << 16) | (rgb[..., 1] << 8) | rgb[..., 2]
     
-    for y in range(height):
-        for x in range(width):
-            r, g, b, a = pixels[x, y]
-            
-            # Skip transparent pixels
-            if a < 10:
-                continue
-            
-            # Detect blue-ish pixels (the background circle)
-            is_blue = b > 80 and (b > r or b > g)
-            
-            if is_blue:
-                # Calculate intensity based on blue value
-                intensity = b / 255.0
-                
-                # Map to Instagram pink (#E1306C) with some gradient variation
-                # Darker blues become more purple, lighter blues become more red/orange
-                new_r = int(min(255, 180 + intensity * 75))  # 180-255
-                new_g = int(min(255, 30 + intensity * 40))   # 30-70
-                new_b = int(min(255, 80 + intensity * 50))   # 80-130
-                
-                pixels[x, y] = (new_r, new_g, new_b, a)
+    # Skip transparent pixels
+    opaque = pixels[..., 3] >= mapping["alpha_min"]
+    pixels[opaque, :3] = lut[index[opaque]]
     
-    return img
+    return Image.fromarray(pixels, "RGBA")
+
+def _convert_blue_python(img, mapping):
+    """Pure-Python backend: the per-pixel rule, with the recolored values looked up per blue level."""
+    recolored = _recolored_by_blue(mapping)
+    blue_min, alpha_min = mapping["blue_min"], mapping["alpha_min"]
+    data = []
+    for r, g, b, a in img.getdata():
+        # Detect blue-ish pixels (the background circle), skipping transparent ones
+        if a >= alpha_min and b > blue_min and (b > r or b > g):
+            data.append(recolored[b] + (a,))
+        else:
+            data.append((r, g, b, a))
+    result = Image.new("RGBA", img.size)
+    result.putdata(data)
+    return result
+
+@traced
+def convert_file(input_path, output_path, mapping=RECOLOR_MAPPING):
+    """Recolor one image file. Large images are streamed through the LUT in bands (the recolor is per pixel)."""
+    if tiles.is_large(input_path):
+        tiles.map_bands(input_path, output_path, lambda band, top: convert_blue_to_instagram(band, mapping))
+    else:
+        convert_blue_to_instagram(Image.open(input_path), mapping).save(output_path, "PNG")
+
+
+def recolor_target_key(input_path, mapping=RECOLOR_MAPPING):
+    """Build-cache key for one recolored icon."""
+    return target_key(files=[input_path], params={"mapping": mapping}, scripts=module_paths("convert_icons", "tiles"))
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Convert X extension icons from blue to Instagram pink.")
+    parser.add_argument("--force", action="store_true",
+                        help="rebuild every icon even if its inputs are unchanged")
+    args = parser.parse_args()
+    
     sizes = [16, 32, 48, 128]
     
     # Ensure output directory exists
     os.makedirs(OUTPUT_DIR, exist_ok=True)
+    cache = BuildCache(force=args.force)
+    
+    def convert(input_path, output_path, size):
+        print(f"Converting icon-{size}.png...")
+        
+        convert_file(input_path, output_path)
+        print(f"  Saved to {output_path}")
     
     for size in sizes:
         input_path = os.path.join(X_ICONS_DIR, f"icon-{size}.png")
@@ -60,16 +158,10 @@ def main():
             print(f"Warning: {input_path} not found, skipping...")
             continue
         
-        print(f"Converting icon-{size}.png...")
-        
-        # Load and convert
-        img = Image.open(input_path)
-        converted = convert_blue_to_instagram(img)
-        
-        # Save
-        converted.save(output_path, "PNG")
-        print(f"  Saved to {output_path}")
+        cache.build(output_path, recolor_target_key(input_path), lambda: convert(input_path, output_path, size))
     
+    cache.save()
+    cache.report()
     print("\nDone! Icons converted to Instagram colors.")
 
 
@@ -3,74 +3,373 @@
 Remove the logo from bottom right corner and generate icon sizes.
 """
 
-from PIL import Image, ImageDraw
+from PIL import Image
+import argparse
 import os
 
+from backends import np
+from buildcache import BuildCache, module_paths, target_key
+from tracing import traced
+import backends
+import tiles
+
 # Input image path
 INPUT_IMAGE = "/Users/tomer.haryoffi/.cursor/projects/Users-tomer-haryoffi-Development-instagram-bookmarks-exporter/assets/image-95758f79-0efb-4feb-b82a-cd9b564ac583.png"
 OUTPUT_DIR = "assets/icons"
+ICON_SIZES = [16, 32, 48, 128]
+
+# Pink background range (exclusive bounds per channel); anything outside it may be watermark
+BG_RANGE = ((200, 240), (40, 90), (100, 140))
+# The sparkle sits in the bottom 18% / right 18% of the image
+WATERMARK_CORNER = 0.18
+# Its connected component may extend into this bottom-right window, but no further
+WATERMARK_SEARCH = 0.30
+
+def background_mask(pixels, bg_range=BG_RANGE):
+    """Return a boolean array marking pixels inside the pink background range."""
+    mask = np.ones(pixels.shape[:2], dtype=bool)
+    for channel, (low, high) in enumerate(bg_range):
+        values = pixels[..., channel]
+        mask &= (values > low) & (values < high)
+    return mask
+
+def _runs(mask):
+    """Return (row, start, end) arrays of the horizontal runs of True in mask (end exclusive)."""
+    height, width = mask.shape
+    padded = np.zeros((height, width + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    return rows, starts, ends
+
+def _connect_runs(rows, starts, ends, width):
+    """Return a component id per run, joining runs that overlap on adjacent rows (4-connectivity)."""
+    count = len(rows)
+    start_keys = rows * width + starts
+    end_keys = rows * width + ends
+    
+    # For every run, the overlapping runs on the row above form a contiguous index range
+    lo = np.searchsorted(end_keys, (rows - 1) * width + starts, side='right')
+    hi = np.searchsorted(start_keys, (rows - 1) * width + ends, side='left')
+    overlaps = np.maximum(hi - lo, 0)
+    below = np.repeat(np.arange(count), overlaps)
+    # Expand each [lo, hi) range: lo of the owning run plus the offset within the range
+    first = np.cumsum(overlaps) - overlaps
+    above = np.repeat(lo, overlaps) + np.arange(len(below)) - np.repeat(first, overlaps)
+    
+    # Min-label propagation with pointer jumping until every component agrees on one id
+    component = np.arange(count)
+    while True:
+        previous = component.copy()
+        joined = np.minimum(component[below], component[above])
+        np.minimum.at(component, below, joined)
+        np.minimum.at(component, above, joined)
+        component = component[component]
+        if np.array_equal(component, previous):
+            return component
+
+def _paint_runs(shape, rows, starts, ends):
+    """Rasterize the given runs back into a boolean mask."""
+    height, width = shape
+    marks = np.zeros(height * width + 1, dtype=np.int32)
+    np.add.at(marks, rows * width + starts, 1)
+    np.add.at(marks, rows * width + ends, -1)
+    return np.cumsum(marks[:-1]).reshape(shape) > 0
+
+def find_watermark(window, corner, bg_range=BG_RANGE):
+    """Locate the watermark inside the bottom-right search window.
+
+    The watermark is every connected non-background component reaching into the corner box,
+    which starts at corner = (x, y) within the window. Returns a boolean mask of the window.
+    """
+    rows, starts, ends = _runs(~background_mask(window, bg_range))
+    if len(rows) == 0:
+        return np.zeros(window.shape[:2], dtype=bool)
+    component = _connect_runs(rows, starts, ends, window.shape[1])
+    
+    # Seeds: runs reaching into the corner box
+    corner_x, corner_y = corner
+    seeds = np.unique(component[(rows >= corner_y) & (ends > corner_x)])
+    # Components touching the window's top or left edge continue into the artwork, not the watermark
+    artwork = np.unique(component[(rows == 0) | (starts == 0)])
+    selected = np.isin(component, np.setdiff1d(seeds, artwork))
+    
+    return _paint_runs(window.shape[:2], rows[selected], starts[selected], ends[selected])
 
-def remove_watermark(img):
-    """Remove the sparkle logo in the bottom right corner by painting over it with the background color."""
+def _inpaint(pixels, region, border=4):
+    """Fill region with a per-channel plane fitted to the background pixels around it."""
+    ring = region.copy()
+    for _ in range(border):
+        grown = ring.copy()
+        grown[1:] |= ring[:-1]
+        grown[:-1] |= ring[1:]
+        grown[:, 1:] |= ring[:, :-1]
+        grown[:, :-1] |= ring[:, 1:]
+        ring = grown
+    ring &= ~region
+    
+    ring_y, ring_x = np.nonzero(ring)
+    fill_y, fill_x = np.nonzero(region)
+    if len(ring_y) < 3:
+        return False
+    
+    # Least-squares plane c = a*x + b*y + d, which also follows the gradient of the background
+    basis = np.column_stack([ring_x, ring_y, np.ones(len(ring_x))]).astype(np.float64)
+    coefficients, *_ = np.linalg.lstsq(basis, pixels[ring_y, ring_x].astype(np.float64), rcond=None)
+    fill_basis = np.column_stack([fill_x, fill_y, np.ones(len(fill_x))]).astype(np.float64)
+    pixels[fill_y, fill_x] = np.clip(np.rint(fill_basis @ coefficients), 0, 255).astype(np.uint8)
+    return True
+
+def _watermark_window(width, height):
+    """Return the (left, top) of the bottom-right search window and the corner inside it."""
+    left, top = int(width * (1 - WATERMARK_SEARCH)), int(height * (1 - WATERMARK_SEARCH))
+    corner = (int(width * (1 - WATERMARK_CORNER)) - left, int(height * (1 - WATERMARK_CORNER)) - top)
+    return left, top, corner
+
+def _clean_window(window, corner, fill, inpaint=False):
+    """Remove the watermark from the search window in place. Returns False if there was none."""
+    region = find_watermark(window, corner)
+    if not region.any():
+        return False
+    if not (inpaint and _inpaint(window, region)):
+        window[region] = fill
+    return True
+
+@traced
+def remove_watermark(img, inpaint=False):
+    """Remove the sparkle logo in the bottom right corner by painting over it with the background color.
+
+    The watermark is found as connected components instead of a fixed box, and filled in bulk.
+    With inpaint=True it is filled from the surrounding background rather than one sampled color.
+    """
     img = img.convert("RGBA")
-    pixels = img.load()
+    if backends.active() == "python":
+        return _remove_watermark_python(img, inpaint)
     width, height = img.size
     
-    # The watermark is in the bottom-right corner
-    # We'll sample the background pink color and paint over the watermark area
+    # Only the bottom-right search window is converted to an array and written back
+    left, top, corner = _watermark_window(width, height)
+    window = np.array(img.crop((left, top, width, height)))
     
     # Get the background pink color from a safe area (top-left corner area)
-    bg_color = pixels[50, 50]  # Should be the pink background
+    if not _clean_window(window, corner, img.getpixel((50, 50)), inpaint):  # Should be the pink background
+        return img
     
-    # Define the area to clean (bottom-right corner where the sparkle is)
-    # Looking at the image, the sparkle is roughly in the bottom 15% and right 15%
-    clean_start_x = int(width * 0.82)
-    clean_start_y = int(height * 0.82)
+    img.paste(Image.fromarray(window, "RGBA"), (left, top))
+    return img
+
+def _remove_watermark_python(img, inpaint=False):
+    """Pure-Python backend of remove_watermark: flood-fills the same components pixel by pixel."""
+    width, height = img.size
+    left, top, (corner_x, corner_y) = _watermark_window(width, height)
+    fill = img.getpixel((50, 50))
+    pixels = img.load()
+    (r_low, r_high), (g_low, g_high), (b_low, b_high) = BG_RANGE
+
+    def is_mark(x, y):
+        r, g, b, _ = pixels[x, y]
+        return not (r_low < r < r_high and g_low < g < g_high and b_low < b < b_high)
+
+    # Components of non-background pixels (4-connected, within the window) reaching into the corner box,
+    # except those touching the window's top or left edge, which continue into the artwork
+    region, seen = set(), set()
+    for y in range(top + corner_y, height):
+        for x in range(left + corner_x, width):
+            if (x, y) in seen or not is_mark(x, y):
+                continue
+            component, stack, artwork = [], [(x, y)], False
+            seen.add((x, y))
+            while stack:
+                px, py = stack.pop()
+                component.append((px, py))
+                artwork = artwork or px == left or py == top
+                for nx, ny in ((px + 1, py), (px - 1, py), (px, py + 1), (px, py - 1)):
+                    if left <= nx < width and top <= ny < height and (nx, ny) not in seen and is_mark(nx, ny):
+                        seen.add((nx, ny))
+                        stack.append((nx, ny))
+            if not artwork:
+                region.update(component)
+
+    if not region:
+        return img
+    if not (inpaint and _inpaint_python(pixels, region, (left, top, width, height))):
+        for x, y in region:
+            pixels[x, y] = fill
+    return img
+
+def _solve3(matrix, vector):
+    """Solve a 3x3 linear system by Gaussian elimination; None if it is singular."""
+    rows = [list(row) + [value] for row, value in zip(matrix, vector)]
+    for col in range(3):
+        pivot = max(range(col, 3), key=lambda row: abs(rows[row][col]))
+        if abs(rows[pivot][col]) < 1e-12:
+            return None
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        for row in range(col + 1, 3):
+            factor = rows[row][col] / rows[col][col]
+            rows[row] = [a - factor * b for a, b in zip(rows[row], rows[col])]
+    solution = [0.0] * 3
+    for row in (2, 1, 0):
+        solution[row] = (rows[row][3] - sum(rows[row][k] * solution[k] for k in range(row + 1, 3))) / rows[row][row]
+    return solution
+
+def _inpaint_python(pixels, region, bounds, border=4):
+    """Pure-Python _inpaint: the same background ring and plane fit, via the normal equations."""
+    left, top, right, bottom = bounds
+    ring = set(region)
+    for _ in range(border):
+        ring |= {(nx, ny) for x, y in ring for nx, ny in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1))
+                 if left <= nx < right and top <= ny < bottom}
+    ring -= region
+    if len(ring) < 3:
+        return False
+
+    # Window-relative coordinates, as in the NumPy version
+    points = [(x - left, y - top, pixels[x, y]) for x, y in ring]
+    sxx = sum(x * x for x, _, _ in points)
+    sxy = sum(x * y for x, y, _ in points)
+    syy = sum(y * y for _, y, _ in points)
+    sx = sum(x for x, _, _ in points)
+    sy = sum(y for _, y, _ in points)
+    normal = [[sxx, sxy, sx], [sxy, syy, sy], [sx, sy, len(points)]]
+    planes = []
+    for channel in range(4):
+        plane = _solve3(normal, [sum(x * c[channel] for x, _, c in points),
+                                 sum(y * c[channel] for _, y, c in points),
+                                 sum(c[channel] for _, _, c in points)])
+        if plane is None:
+            return False
+        planes.append(plane)
+
+    for x, y in region:
+        rx, ry = x - left, y - top
+        pixels[x, y] = tuple(min(255, max(0, round(a * rx + b * ry + d))) for a, b, d in planes)
+    return True
+
+@traced
+def remove_watermark_tiled(input_path, output_path, inpaint=False):
+    """remove_watermark for sources too large to hold in memory, streaming the PNG in bands.
+
+    A first pass collects only the search window; the second re-reads the source and writes every
+    band, with the cleaned window pasted into the bands it overlaps. The output pixels are identical.
+    """
+    backends.require_numpy("Tiled watermark removal")
+    width, height = tiles.image_size(input_path)
+    left, top, corner = _watermark_window(width, height)
+    window = np.empty((height - top, width - left, 4), dtype=np.uint8)
+    fill = None
+    for band_top, band in tiles.iter_bands(input_path):
+        band_bottom = band_top + band.height
+        if band_top <= 50 < band_bottom:
+            fill = band.convert("RGBA").getpixel((50, 50 - band_top))
+        if band_bottom > top:
+            start = max(top, band_top)
+            window[start - top:band_bottom - top] = np.asarray(
+                band.crop((left, start - band_top, width, band.height)).convert("RGBA"))
     
-    draw = ImageDraw.Draw(img)
+    changed = _clean_window(window, corner, fill, inpaint)
     
-    # Paint over the watermark area with the background color
-    for y in range(clean_start_y, height):
-        for x in range(clean_start_x, width):
-            r, g, b, a = pixels[x, y]
-            # If pixel is not the background pink (i.e., it's part of the watermark)
-            # Check if it's whitish or different from pink background
-            if not (200 < r < 240 and 40 < g < 90 and 100 < b < 140):
-                pixels[x, y] = bg_color
+    def paste_window(band, band_top):
+        band = band.convert("RGBA")
+        band_bottom = band_top + band.height
+        if changed and band_bottom > top:
+            start = max(top, band_top)
+            band.paste(Image.fromarray(window[start - top:band_bottom - top], "RGBA"), (left, start - band_top))
+        return band
     
-    return img
+    tiles.map_bands(input_path, output_path, paste_window)
+
+def resize_icon(img, size):
+    """Resize the cleaned source to one icon size."""
+    # Resize with high-quality resampling
+    return img.resize((size, size), Image.Resampling.LANCZOS)
+
+
+@traced
+def create_icon(img, size, output_path):
+    """Resize the cleaned source to one icon size and save it."""
+    resize_icon(img, size).save(output_path, "PNG")
+    print(f"Created {output_path} ({size}x{size})")
 
 
 def create_icons(img):
     """Create all icon sizes from the source image."""
-    sizes = [16, 32, 48, 128]
-    
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     
-    for size in sizes:
-        # Resize with high-quality resampling
-        resized = img.resize((size, size), Image.Resampling.LANCZOS)
-        
-        output_path = os.path.join(OUTPUT_DIR, f"icon-{size}.png")
-        resized.save(output_path, "PNG")
-        print(f"Created {output_path} ({size}x{size})")
+    for size in ICON_SIZES:
+        create_icon(img, size, os.path.join(OUTPUT_DIR, f"icon-{size}.png"))
+
+
+def clean_target_key(output_path, inpaint=False):
+    """Build-cache key for the cleaned source or one of the icons resized from it."""
+    params = {
+        "inpaint": inpaint,
+        "bg_range": BG_RANGE,
+        "corner": WATERMARK_CORNER,
+        "search": WATERMARK_SEARCH,
+        "output": os.path.basename(output_path),
+    }
+    return target_key(files=[INPUT_IMAGE], params=params, scripts=module_paths("create_clean_icons", "tiles"))
 
 
 def main():
-    print(f"Loading image: {INPUT_IMAGE}")
-    img = Image.open(INPUT_IMAGE)
-    print(f"Original size: {img.size}")
+    parser = argparse.ArgumentParser(description="Remove the watermark and generate icon sizes.")
+    parser.add_argument("--inpaint", action="store_true",
+                        help="fill the watermark from the surrounding background instead of one sampled color")
+    parser.add_argument("--force", action="store_true",
+                        help="rebuild every output even if its inputs are unchanged")
+    parser.add_argument("--tiled", action="store_true",
+                        help=f"stream the source in bands (automatic above {tiles.LARGE_PIXELS:,} pixels)")
+    args = parser.parse_args()
+    
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    cache = BuildCache(force=args.force)
+    
+    def key(output_path):
+        return clean_target_key(output_path, args.inpaint)
+    
+    # The watermark is only removed if some output is actually stale
+    cleaned = []
+    source_output = os.path.join(OUTPUT_DIR, "icon-source.png")
     
-    print("\nRemoving watermark...")
-    clean_img = remove_watermark(img)
+    def tiled():
+        # Print-resolution artwork is streamed in bands instead of decoded whole
+        return args.tiled or tiles.is_large(INPUT_IMAGE)
     
-    # Save a cleaned full-size version for reference
-    clean_img.save(os.path.join(OUTPUT_DIR, "icon-source.png"), "PNG")
-    print("Saved cleaned source image")
+    def clean_image():
+        if not cleaned:
+            if tiled():
+                # The icons only need a reduced copy of the cleaned full-size source
+                print(f"Loading reduced image: {source_output}")
+                cleaned.append(tiles.load_reduced(source_output, max(ICON_SIZES)).convert("RGBA"))
+                return cleaned[0]
+            
+            print(f"Loading image: {INPUT_IMAGE}")
+            img = Image.open(INPUT_IMAGE)
+            print(f"Original size: {img.size}")
+            
+            print("\nRemoving watermark...")
+            cleaned.append(remove_watermark(img, inpaint=args.inpaint))
+        return cleaned[0]
     
-    print("\nGenerating icons...")
-    create_icons(clean_img)
+    def save_source(output_path):
+        # Save a cleaned full-size version for reference
+        if tiled():
+            print(f"Removing watermark in bands: {INPUT_IMAGE} {tiles.image_size(INPUT_IMAGE)}")
+            remove_watermark_tiled(INPUT_IMAGE, output_path, inpaint=args.inpaint)
+        else:
+            clean_image().save(output_path, "PNG")
+        print("Saved cleaned source image")
+    
+    cache.build(source_output, key(source_output), lambda: save_source(source_output))
+    
+    for size in ICON_SIZES:
+        output_path = os.path.join(OUTPUT_DIR, f"icon-{size}.png")
+        cache.build(output_path, key(output_path), lambda: create_icon(clean_image(), size, output_path))
     
+    cache.save()
+    cache.report()
     print("\nDone!")
 
 
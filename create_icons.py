@@ -4,64 +4,78 @@ Create extension icons with Instagram pink gradient background.
 Replaces the blue background from the source image with pink gradient.
 """
 
-from PIL import Image, ImageDraw
+from PIL import Image
+import argparse
+import contextlib
+import io
+import multiprocessing
 import os
-import math
-
-def create_gradient_background(size, color1, color2, corner_radius=None):
-    """Create a gradient background from top-left to bottom-right."""
-    img = Image.new('RGBA', (size, size), (0, 0, 0, 0))
-    draw = ImageDraw.Draw(img)
-    
-    # Parse hex colors
-    r1, g1, b1 = int(color1[1:3], 16), int(color1[3:5], 16), int(color1[5:7], 16)
-    r2, g2, b2 = int(color2[1:3], 16), int(color2[3:5], 16), int(color2[5:7], 16)
-    
-    # Create gradient (diagonal from top-left to bottom-right)
-    for y in range(size):
-        for x in range(size):
-            # Calculate gradient position (0 to 1) based on diagonal
-            t = (x + y) / (2 * size)
-            
-            r = int(r1 + (r2 - r1) * t)
-            g = int(g1 + (g2 - g1) * t)
-            b = int(b1 + (b2 - b1) * t)
-            
-            img.putpixel((x, y), (r, g, b, 255))
+import resource
+import tempfile
+import time
+
+from buildcache import BuildCache, module_paths, target_key
+from gradients import linear_gradient, linear_gradients
+from masks import ellipse_mask, mask_cache_stats, rounded_rect_mask
+from tracing import traced
+import tiles
+
+# Instagram pink gradient colors from gallery.html
+GRADIENT_COLOR1 = "#E1306C"  # --ig-pink (lighter)
+GRADIENT_COLOR2 = "#c13584"  # --ig-pink-dark (darker)
+
+# Icon sizes for Chrome extension, plus the high-res source
+ICON_SIZES = [16, 32, 48, 128]
+SOURCE_SIZE = 512
+
+@traced
+def create_gradient_background(size, color1, color2, corner_radius=None, angle=45, stops=None, supersample=1):
+    """Create a gradient background, by default diagonal from top-left to bottom-right.
+
+    Pass `stops` (a list of colors or (position, color) pairs) for multi-stop gradients.
+    """
+    img = linear_gradient(size, stops or [color1, color2], angle)
     
     # Apply rounded corners if specified
     if corner_radius:
-        # Create a mask for rounded corners
-        mask = Image.new('L', (size, size), 0)
-        mask_draw = ImageDraw.Draw(mask)
-        mask_draw.rounded_rectangle([(0, 0), (size-1, size-1)], radius=corner_radius, fill=255)
-        img.putalpha(mask)
+        # Mask for rounded corners, shared across calls with the same geometry
+        img.putalpha(rounded_rect_mask(size, corner_radius, supersample))
     
     return img
 
-def create_icon_with_photo(source_path, output_path, size, gradient_color1, gradient_color2):
-    """Create an icon with the photo on a gradient background."""
-    
-    # Load source image
-    source = Image.open(source_path).convert('RGBA')
-    source_size = source.size[0]
-    
-    # Calculate corner radius (proportional to size)
-    corner_radius = int(size * 0.15)
-    
+@traced
+def create_gradient_backgrounds(sizes, color1, color2, corner_radii=None, angle=45, stops=None, supersample=1):
+    """Create the same gradient background at several sizes in one batch. Returns {size: image}.
+
+    `corner_radii` maps each size to its corner radius; sizes missing from it keep square corners.
+    """
+    images = linear_gradients(sizes, stops or [color1, color2], angle)
+    for size, img in images.items():
+        if (corner_radii or {}).get(size):
+            img.putalpha(rounded_rect_mask(size, corner_radii[size], supersample))
+    return images
+
+def icon_corner_radius(size):
+    """Icon corner radius, proportional to the size."""
+    return int(size * 0.15)
+
+@traced
+def render_icon(source, size, gradient_color1, gradient_color2, supersample=1, background=None):
+    """Render an icon from an already-decoded RGBA source image and return it.
+
+    Masks come from the shared mask cache; supersample > 1 anti-aliases their edges. `background`
+    is a gradient already made by create_gradient_backgrounds for this size.
+    """
     # Create gradient background
-    bg = create_gradient_background(size, gradient_color1, gradient_color2, corner_radius)
+    bg = background or create_gradient_background(size, gradient_color1, gradient_color2, icon_corner_radius(size),
+                                                  supersample=supersample)
     
     # Create white circle
     circle_margin = int(size * 0.08)
     circle_size = size - (circle_margin * 2)
     
-    circle = Image.new('RGBA', (size, size), (0, 0, 0, 0))
-    circle_draw = ImageDraw.Draw(circle)
-    circle_draw.ellipse(
-        [circle_margin, circle_margin, size - circle_margin, size - circle_margin],
-        fill=(255, 255, 255, 255)
-    )
+    circle = Image.new('RGBA', (size, size), (255, 255, 255, 255))
+    circle.putalpha(ellipse_mask(size, circle_margin, supersample))
     
     # Composite circle onto background
     result = Image.alpha_composite(bg, circle)
@@ -78,30 +92,151 @@ def create_icon_with_photo(source_path, output_path, size, gradient_color1, grad
     source_resized = source.resize((size, size), Image.Resampling.LANCZOS)
     
     # Create mask to extract just the inner photo (not the blue background)
-    photo_mask = Image.new('L', (size, size), 0)
-    photo_mask_draw = ImageDraw.Draw(photo_mask)
     # Make the mask slightly smaller than the white circle to avoid blue edges
     inner_margin = int(size * 0.10)
-    photo_mask_draw.ellipse(
-        [inner_margin, inner_margin, size - inner_margin, size - inner_margin],
-        fill=255
-    )
+    photo_mask = ellipse_mask(size, inner_margin, supersample)
     
     # Apply mask to source
     source_masked = Image.new('RGBA', (size, size), (0, 0, 0, 0))
     source_masked.paste(source_resized, (0, 0), photo_mask)
     
     # Composite photo onto result
-    result = Image.alpha_composite(result, source_masked)
+    return Image.alpha_composite(result, source_masked)
+
+def render_icons(source, sizes, gradient_color1, gradient_color2, supersample=1):
+    """Render several sizes of one color theme natively, with the gradients made in one batch. Returns {size: image}."""
+    backgrounds = create_gradient_backgrounds(sizes, gradient_color1, gradient_color2,
+                                              {size: icon_corner_radius(size) for size in sizes}, supersample=supersample)
+    return {size: render_icon(source, size, gradient_color1, gradient_color2, supersample, backgrounds[size])
+            for size in sizes}
+
+def load_source(source_path, size=None):
+    """Open and decode the icon source image once.
+
+    With a target size, very large sources are pre-shrunk while decoding (JPEG draft mode, or a
+    band-by-band Image.reduce for PNG) so the full-resolution image is never held in memory.
+    """
+    if size and tiles.is_large(source_path):
+        return tiles.load_reduced(source_path, size).convert('RGBA')
+    return Image.open(source_path).convert('RGBA')
+
+@traced
+def create_icon_with_photo(source_path, output_path, size, gradient_color1, gradient_color2, supersample=1):
+    """Create an icon with the photo on a gradient background."""
+    result = render_icon(load_source(source_path, size), size, gradient_color1, gradient_color2, supersample)
     
     # Save
     result.save(output_path, 'PNG')
     print(f"Created: {output_path} ({size}x{size})")
 
+def downsample(img, size):
+    """Shrink a square RGBA icon, using Image.reduce when the ratio is a whole number."""
+    if img.size[0] % size == 0:
+        return img.reduce(img.size[0] // size)
+    return img.resize((size, size), Image.Resampling.LANCZOS)
+
+@traced
+def render_icon_pyramid(source, sizes, gradient_color1, gradient_color2, native_below=0, supersample=1):
+    """Render the largest size once and derive the smaller ones from it.
+
+    Each level is taken from the smallest already-rendered level that divides it exactly
+    (box reduce), otherwise from the smallest level at least twice as large (LANCZOS), so
+    detail is never lost to a long chain of resamples. Sizes up to `native_below` are
+    re-rendered natively from the source for crispness. Returns {size: image}.
+    """
+    sizes = sorted(set(sizes), reverse=True)
+    levels = {sizes[0]: render_icon(source, sizes[0], gradient_color1, gradient_color2, supersample)}
+    
+    for size in sizes[1:]:
+        if size <= native_below:
+            levels[size] = render_icon(source, size, gradient_color1, gradient_color2, supersample)
+        else:
+            levels[size] = downsample(levels[pyramid_parent(levels, size)], size)
+    
+    return levels
+
+def pyramid_parent(levels, size):
+    """The rendered level to derive `size` from: the smallest exact multiple, else the smallest 2x+ level."""
+    larger = sorted(level for level in levels if level > size)
+    if not larger:
+        raise ValueError(f"no rendered level larger than {size}px")
+    divisible = [level for level in larger if level % size == 0]
+    roomy = [level for level in larger if level >= size * 2]
+    return (divisible or roomy or larger)[0]
+
+@traced
+def create_icon_pyramid(source_path, outputs, gradient_color1, gradient_color2, native_below=0, supersample=1):
+    """Decode the source once, render the pyramid and save each level. `outputs` maps size to path."""
+    source = load_source(source_path, max(outputs))
+    levels = render_icon_pyramid(source, outputs.keys(), gradient_color1, gradient_color2,
+                                 native_below, supersample)
+    
+    for size, output_path in outputs.items():
+        levels[size].save(output_path, 'PNG')
+        print(f"Created: {output_path} ({size}x{size})")
+
+def output_paths(output_dir):
+    """Map each rendered size to its output file."""
+    # Plus a high-res render; icon-source.png is only ever read, so the outputs never feed back into it
+    return {size: os.path.join(output_dir, f"icon-{size}.png") for size in ICON_SIZES + [SOURCE_SIZE]}
+
+def icon_target_key(source_path, size, sizes, pyramid=False, native_below=0, antialias=1):
+    """Build-cache key for one rendered icon size."""
+    params = {
+        "colors": [GRADIENT_COLOR1, GRADIENT_COLOR2],
+        "size": size,
+        "sizes": sizes,
+        "pyramid": pyramid,
+        "native_below": native_below,
+        "antialias": antialias,
+    }
+    return target_key(files=[source_path], params=params, scripts=module_paths("create_icons", "gradients", "masks", "tiles"))
+
+def _measure_run(source_path, output_dir, pyramid, native_below, results):
+    """Run one generation path in a fresh process and report wall time and peak RSS."""
+    start = time.perf_counter()
+    outputs = output_paths(output_dir)
+    with contextlib.redirect_stdout(io.StringIO()):
+        if pyramid:
+            create_icon_pyramid(source_path, outputs, GRADIENT_COLOR1, GRADIENT_COLOR2, native_below)
+        else:
+            for size, output_path in outputs.items():
+                create_icon_with_photo(source_path, output_path, size, GRADIENT_COLOR1, GRADIENT_COLOR2)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is in kilobytes on Linux
+    results.put((elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+
+def compare_paths(source_path, native_below):
+    """Print the wall-time and peak-memory difference between per-size and pyramid rendering."""
+    ctx = multiprocessing.get_context('spawn')
+    measurements = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, pyramid in (("per-size", False), ("pyramid", True)):
+            results = ctx.Queue()
+            worker = ctx.Process(target=_measure_run, args=(source_path, tmp, pyramid, native_below, results))
+            worker.start()
+            measurements[label] = results.get()
+            worker.join()
+    
+    for label, (elapsed, peak_kb) in measurements.items():
+        print(f"{label:>9}: {elapsed * 1000:8.1f} ms, peak RSS {peak_kb / 1024:7.1f} MB")
+    (old_time, old_peak), (new_time, new_peak) = measurements["per-size"], measurements["pyramid"]
+    print(f"{'saved':>9}: {(old_time - new_time) * 1000:8.1f} ms ({old_time / new_time:.1f}x), "
+          f"{(old_peak - new_peak) / 1024:.1f} MB")
+
 def main():
-    # Instagram pink gradient colors from gallery.html
-    GRADIENT_COLOR1 = "#E1306C"  # --ig-pink (lighter)
-    GRADIENT_COLOR2 = "#c13584"  # --ig-pink-dark (darker)
+    parser = argparse.ArgumentParser(description="Create extension icons with the Instagram pink gradient.")
+    parser.add_argument("--pyramid", action="store_true",
+                        help="decode the source once, render 512px once and downsample the smaller sizes")
+    parser.add_argument("--native-below", type=int, default=0, metavar="PX",
+                        help="in pyramid mode, re-render sizes up to PX natively for crispness")
+    parser.add_argument("--antialias", type=int, default=1, metavar="N",
+                        help="supersample the corner and circle masks N times for smoother edges")
+    parser.add_argument("--force", action="store_true",
+                        help="rebuild every icon even if its inputs are unchanged")
+    parser.add_argument("--compare", action="store_true",
+                        help="report wall time and peak memory of the per-size and pyramid paths")
+    args = parser.parse_args()
     
     # Paths
     script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -117,22 +252,42 @@ def main():
             print(f"Error: Source image not found at {source_path}")
             return
     
-    # Icon sizes for Chrome extension
-    sizes = [16, 32, 48, 128]
+    if args.compare:
+        compare_paths(source_path, args.native_below)
+        return
     
     output_dir = os.path.join(script_dir, "assets", "icons")
     os.makedirs(output_dir, exist_ok=True)
+    outputs = output_paths(output_dir)
     
-    # Create icons
-    for size in sizes:
-        output_path = os.path.join(output_dir, f"icon-{size}.png")
-        create_icon_with_photo(source_path, output_path, size, GRADIENT_COLOR1, GRADIENT_COLOR2)
+    cache = BuildCache(force=args.force)
+    keys = {size: icon_target_key(source_path, size, sorted(outputs), args.pyramid, args.native_below,
+                                  args.antialias)
+            for size in outputs}
     
-    # Also create a high-res source
-    source_output = os.path.join(output_dir, "icon-source.png")
-    create_icon_with_photo(source_path, source_output, 512, GRADIENT_COLOR1, GRADIENT_COLOR2)
+    # Pyramid levels are rendered on the first stale size and shared by the rest
+    levels = {}
+    
+    def build(size, output_path):
+        if not args.pyramid:
+            create_icon_with_photo(source_path, output_path, size, GRADIENT_COLOR1, GRADIENT_COLOR2,
+                                   args.antialias)
+            return
+        if not levels:
+            levels.update(render_icon_pyramid(load_source(source_path, max(outputs)), outputs.keys(), GRADIENT_COLOR1,
+                                              GRADIENT_COLOR2, args.native_below, args.antialias))
+        levels[size].save(output_path, 'PNG')
+        print(f"Created: {output_path} ({size}x{size})")
+    
+    # Create icons
+    for size, output_path in outputs.items():
+        cache.build(output_path, keys[size], lambda: build(size, output_path))
+    cache.save()
     
-    print("\nAll icons created successfully!")
+    stats = mask_cache_stats()
+    print(f"\nMask cache: {stats['hits']} hits, {stats['misses']} misses")
+    cache.report()
+    print("All icons created successfully!")
     print(f"Output directory: {output_dir}")
 
 if __name__ == "__main__":
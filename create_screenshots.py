@@ -3,8 +3,17 @@
 Generate Chrome Web Store screenshots (1280x800)
 """
 
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image
+import argparse
+import functools
+import json
 import os
+import time
+
+from buildcache import BuildCache, module_paths, target_key
+from layout import Circle, Grid, RoundedRect, Text, compile_layout, rasterize
+from tracing import traced
+import fonts
 
 # Screenshot dimensions for Chrome Web Store
 WIDTH = 1280
@@ -19,182 +28,100 @@ WHITE = (255, 255, 255)
 GRAY = (100, 100, 100)
 GREEN = (64, 196, 99)  # #40c463
 
-def create_gradient_bg(width, height):
-    """Create a dark gradient background"""
-    img = Image.new('RGB', (width, height), BG_DARK)
-    draw = ImageDraw.Draw(img)
-    
+@traced
+def create_gradient_bg(width, height, top=BG_DARK, bottom=BG_GRADIENT_END):
+    """Create a dark gradient background.
+
+    The background is rendered once per (width, height, colors); callers get a cheap copy.
+    """
+    return _render_gradient_bg(width, height, tuple(top), tuple(bottom)).copy()
+
+@functools.lru_cache(maxsize=16)
+def _render_gradient_bg(width, height, top, bottom):
+    """Render a vertical gradient as one column of row colors stretched to the full width."""
+    rows = []
     for y in range(height):
-        r = int(BG_DARK[0] + (BG_GRADIENT_END[0] - BG_DARK[0]) * y / height)
-        g = int(BG_DARK[1] + (BG_GRADIENT_END[1] - BG_DARK[1]) * y / height)
-        b = int(BG_DARK[2] + (BG_GRADIENT_END[2] - BG_DARK[2]) * y / height)
-        draw.line([(0, y), (width, y)], fill=(r, g, b))
+        rows.append(tuple(int(top[c] + (bottom[c] - top[c]) * y / height) for c in range(3)))
     
-    return img
-
-def draw_rounded_rect(draw, coords, radius, fill):
-    """Draw a rounded rectangle"""
-    x1, y1, x2, y2 = coords
-    draw.rectangle([x1 + radius, y1, x2 - radius, y2], fill=fill)
-    draw.rectangle([x1, y1 + radius, x2, y2 - radius], fill=fill)
-    draw.ellipse([x1, y1, x1 + 2*radius, y1 + 2*radius], fill=fill)
-    draw.ellipse([x2 - 2*radius, y1, x2, y1 + 2*radius], fill=fill)
-    draw.ellipse([x1, y2 - 2*radius, x1 + 2*radius, y2], fill=fill)
-    draw.ellipse([x2 - 2*radius, y2 - 2*radius, x2, y2], fill=fill)
+    column = Image.new('RGB', (1, height))
+    column.putdata(rows)
+    # Nearest-neighbour stretch copies each row color verbatim across the width
+    return column.resize((width, height), Image.Resampling.NEAREST)
 
-def get_font(size):
-    """Get a font, falling back to default if needed"""
-    try:
-        return ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", size)
-    except:
-        try:
-            return ImageFont.truetype("/System/Library/Fonts/SFNSText.ttf", size)
-        except:
-            return ImageFont.load_default()
+# Layouts, in 1280x800 design units. Text strings double as translation keys.
 
-def create_screenshot_1():
+def _popup_layout():
     """Screenshot 1: Extension popup with stats"""
-    img = create_gradient_bg(WIDTH, HEIGHT)
-    draw = ImageDraw.Draw(img)
-    
-    # Title at top
-    font_large = get_font(48)
-    font_med = get_font(28)
-    font_small = get_font(20)
-    
-    title = "Export Your Instagram Saved Posts"
-    bbox = draw.textbbox((0, 0), title, font=font_large)
-    text_width = bbox[2] - bbox[0]
-    draw.text(((WIDTH - text_width) // 2, 60), title, fill=WHITE, font=font_large)
-    
-    subtitle = "Capture images, videos, and carousels with one click"
-    bbox = draw.textbbox((0, 0), subtitle, font=font_med)
-    text_width = bbox[2] - bbox[0]
-    draw.text(((WIDTH - text_width) // 2, 130), subtitle, fill=GRAY, font=font_med)
-    
-    # Draw popup mockup in center
     popup_w, popup_h = 320, 380
     popup_x = (WIDTH - popup_w) // 2
     popup_y = 200
-    
-    # Popup background
-    draw_rounded_rect(draw, (popup_x, popup_y, popup_x + popup_w, popup_y + popup_h), 16, (30, 30, 50))
-    
-    # Popup header
-    draw.text((popup_x + 60, popup_y + 25), "IG Exporter", fill=WHITE, font=font_med)
-    draw_rounded_rect(draw, (popup_x + 220, popup_y + 25, popup_x + 280, popup_y + 50), 8, (225, 48, 108, 50))
-    draw.text((popup_x + 232, popup_y + 28), "v4.1.0", fill=PINK, font=font_small)
-    
-    # Stats boxes
     box_y = popup_y + 80
-    # Images box
-    draw_rounded_rect(draw, (popup_x + 20, box_y, popup_x + 150, box_y + 90), 12, (40, 40, 60))
-    draw.text((popup_x + 60, box_y + 15), "127", fill=GREEN, font=font_large)
-    draw.text((popup_x + 55, box_y + 60), "Images", fill=GRAY, font=font_small)
-    
-    # Videos box  
-    draw_rounded_rect(draw, (popup_x + 170, box_y, popup_x + 300, box_y + 90), 12, (40, 40, 60))
-    draw.text((popup_x + 220, box_y + 15), "43", fill=PINK, font=font_large)
-    draw.text((popup_x + 210, box_y + 60), "Videos", fill=GRAY, font=font_small)
-    
-    # Buttons
     btn_y = popup_y + 200
-    # Capture button (gradient pink)
-    draw_rounded_rect(draw, (popup_x + 20, btn_y, popup_x + 150, btn_y + 50), 10, PINK)
-    draw.text((popup_x + 35, btn_y + 12), "🎠 Capture", fill=WHITE, font=font_small)
     
-    # Gallery button
-    draw_rounded_rect(draw, (popup_x + 170, btn_y, popup_x + 300, btn_y + 50), 10, PURPLE)
-    draw.text((popup_x + 195, btn_y + 12), "🖼 Gallery", fill=WHITE, font=font_small)
-    
-    # Clear button
-    draw_rounded_rect(draw, (popup_x + 20, btn_y + 70, popup_x + 300, btn_y + 120), 10, (80, 40, 40))
-    draw.text((popup_x + 125, btn_y + 82), "🗑 Clear", fill=WHITE, font=font_small)
-    
-    # Bottom tagline
-    tagline = "Free • Private • No data sent to servers"
-    bbox = draw.textbbox((0, 0), tagline, font=font_small)
-    text_width = bbox[2] - bbox[0]
-    draw.text(((WIDTH - text_width) // 2, HEIGHT - 60), tagline, fill=GRAY, font=font_small)
-    
-    return img
+    return [
+        # Title at top
+        Text("Export Your Instagram Saved Posts", y=60, size=48, fill=WHITE, center=True),
+        Text("Capture images, videos, and carousels with one click", y=130, size=28, fill=GRAY, center=True),
+        
+        # Popup background and header
+        RoundedRect((popup_x, popup_y, popup_x + popup_w, popup_y + popup_h), 16, (30, 30, 50)),
+        Text("IG Exporter", popup_x + 60, popup_y + 25, 28, WHITE),
+        RoundedRect((popup_x + 220, popup_y + 25, popup_x + 280, popup_y + 50), 8, (225, 48, 108, 50)),
+        Text("v4.1.0", popup_x + 232, popup_y + 28, 20, PINK),
+        
+        # Stats boxes
+        RoundedRect((popup_x + 20, box_y, popup_x + 150, box_y + 90), 12, (40, 40, 60)),
+        Text("127", popup_x + 60, box_y + 15, 48, GREEN),
+        Text("Images", popup_x + 55, box_y + 60, 20, GRAY),
+        RoundedRect((popup_x + 170, box_y, popup_x + 300, box_y + 90), 12, (40, 40, 60)),
+        Text("43", popup_x + 220, box_y + 15, 48, PINK),
+        Text("Videos", popup_x + 210, box_y + 60, 20, GRAY),
+        
+        # Buttons
+        RoundedRect((popup_x + 20, btn_y, popup_x + 150, btn_y + 50), 10, PINK),
+        Text("🎠 Capture", popup_x + 35, btn_y + 12, 20, WHITE),
+        RoundedRect((popup_x + 170, btn_y, popup_x + 300, btn_y + 50), 10, PURPLE),
+        Text("🖼 Gallery", popup_x + 195, btn_y + 12, 20, WHITE),
+        RoundedRect((popup_x + 20, btn_y + 70, popup_x + 300, btn_y + 120), 10, (80, 40, 40)),
+        Text("🗑 Clear", popup_x + 125, btn_y + 82, 20, WHITE),
+        
+        # Bottom tagline
+        Text("Free • Private • No data sent to servers", y=HEIGHT - 60, size=20, fill=GRAY, center=True),
+    ]
 
-def create_screenshot_2():
+def _gallery_layout():
     """Screenshot 2: Gallery view with images"""
-    img = create_gradient_bg(WIDTH, HEIGHT)
-    draw = ImageDraw.Draw(img)
-    
-    font_large = get_font(48)
-    font_med = get_font(28)
-    font_small = get_font(20)
-    
-    # Title
-    title = "Beautiful Gallery View"
-    bbox = draw.textbbox((0, 0), title, font=font_large)
-    text_width = bbox[2] - bbox[0]
-    draw.text(((WIDTH - text_width) // 2, 40), title, fill=WHITE, font=font_large)
-    
-    subtitle = "Browse, preview, and download your saved media"
-    bbox = draw.textbbox((0, 0), subtitle, font=font_med)
-    text_width = bbox[2] - bbox[0]
-    draw.text(((WIDTH - text_width) // 2, 100), subtitle, fill=GRAY, font=font_med)
-    
-    # Gallery grid mockup
-    grid_start_x = 100
-    grid_start_y = 180
     cell_size = 180
-    gap = 15
-    
     colors = [
         (64, 196, 99), (225, 48, 108), (131, 58, 180), (64, 93, 230),
         (253, 29, 29), (245, 166, 35), (64, 196, 99), (225, 48, 108),
         (131, 58, 180), (64, 93, 230), (253, 29, 29), (245, 166, 35)
     ]
     
-    idx = 0
-    for row in range(3):
-        for col in range(6):
-            x = grid_start_x + col * (cell_size + gap)
-            y = grid_start_y + row * (cell_size + gap)
-            
-            if x + cell_size > WIDTH - 50:
-                continue
-                
-            # Draw image placeholder
-            color = colors[idx % len(colors)]
-            draw_rounded_rect(draw, (x, y, x + cell_size, y + cell_size), 12, color)
-            
-            # Add some variety - video icon on some
-            if idx % 4 == 0:
-                draw.text((x + 70, y + 70), "▶", fill=WHITE, font=font_large)
-            
-            idx += 1
+    def placeholder(idx):
+        # Image placeholder, with a video icon on some for variety
+        cell = [RoundedRect((0, 0, cell_size, cell_size), 12, colors[idx % len(colors)])]
+        if idx % 4 == 0:
+            cell.append(Text("▶", 70, 70, 48, WHITE))
+        return cell
     
-    # Bottom stats bar
     bar_y = HEIGHT - 80
-    draw_rounded_rect(draw, (100, bar_y, WIDTH - 100, bar_y + 50), 12, (40, 40, 60))
-    draw.text((150, bar_y + 12), "📸 127 Images", fill=GREEN, font=font_small)
-    draw.text((350, bar_y + 12), "🎬 43 Videos", fill=PINK, font=font_small)
-    draw.text((550, bar_y + 12), "📥 Click to Download", fill=WHITE, font=font_small)
-    
-    return img
+    return [
+        Text("Beautiful Gallery View", y=40, size=48, fill=WHITE, center=True),
+        Text("Browse, preview, and download your saved media", y=100, size=28, fill=GRAY, center=True),
+        
+        # Gallery grid mockup
+        Grid((100, 180), rows=3, cols=6, cell_size=cell_size, gap=15, cell=placeholder, max_right=WIDTH - 50),
+        
+        # Bottom stats bar
+        RoundedRect((100, bar_y, WIDTH - 100, bar_y + 50), 12, (40, 40, 60)),
+        Text("📸 127 Images", 150, bar_y + 12, 20, GREEN),
+        Text("🎬 43 Videos", 350, bar_y + 12, 20, PINK),
+        Text("📥 Click to Download", 550, bar_y + 12, 20, WHITE),
+    ]
 
-def create_screenshot_3():
+def _howto_layout():
     """Screenshot 3: How it works - 3 steps"""
-    img = create_gradient_bg(WIDTH, HEIGHT)
-    draw = ImageDraw.Draw(img)
-    
-    font_large = get_font(48)
-    font_med = get_font(32)
-    font_small = get_font(22)
-    
-    # Title
-    title = "How It Works"
-    bbox = draw.textbbox((0, 0), title, font=font_large)
-    text_width = bbox[2] - bbox[0]
-    draw.text(((WIDTH - text_width) // 2, 60), title, fill=WHITE, font=font_large)
-    
-    # Three steps
     steps = [
         ("1", "Go to Saved Posts", "Navigate to your Instagram\nsaved posts page"),
         ("2", "Click Capture", "The extension automatically\nscans all your posts"),
@@ -204,52 +131,27 @@ def create_screenshot_3():
     step_width = 350
     start_x = (WIDTH - (step_width * 3 + 60)) // 2
     step_y = 200
+    circle_r = 50
     
+    elements = [Text("How It Works", y=60, size=48, fill=WHITE, center=True)]
     for i, (num, title_text, desc) in enumerate(steps):
         x = start_x + i * (step_width + 30)
-        
-        # Step circle
         circle_x = x + step_width // 2
-        circle_r = 50
-        draw.ellipse([circle_x - circle_r, step_y, circle_x + circle_r, step_y + circle_r * 2], fill=PINK)
-        draw.text((circle_x - 15, step_y + 25), num, fill=WHITE, font=font_large)
-        
-        # Title
-        bbox = draw.textbbox((0, 0), title_text, font=font_med)
-        tw = bbox[2] - bbox[0]
-        draw.text((x + (step_width - tw) // 2, step_y + 130), title_text, fill=WHITE, font=font_med)
-        
-        # Description
-        lines = desc.split('\n')
-        for j, line in enumerate(lines):
-            bbox = draw.textbbox((0, 0), line, font=font_small)
-            tw = bbox[2] - bbox[0]
-            draw.text((x + (step_width - tw) // 2, step_y + 180 + j * 30), line, fill=GRAY, font=font_small)
+        elements += [
+            # Step circle
+            Circle((circle_x - circle_r, step_y, circle_x + circle_r, step_y + circle_r * 2), PINK),
+            Text(num, circle_x - 15, step_y + 25, 48, WHITE),
+            Text(title_text, y=step_y + 130, size=32, fill=WHITE, center=(x, step_width)),
+            Text(desc, y=step_y + 180, size=22, fill=GRAY, center=(x, step_width), line_height=30),
+        ]
     
     # Features at bottom
-    features = "✓ Captures carousels & reels  •  ✓ 100% private  •  ✓ Free forever"
-    bbox = draw.textbbox((0, 0), features, font=font_small)
-    text_width = bbox[2] - bbox[0]
-    draw.text(((WIDTH - text_width) // 2, HEIGHT - 100), features, fill=GREEN, font=font_small)
-    
-    return img
+    elements.append(Text("✓ Captures carousels & reels  •  ✓ 100% private  •  ✓ Free forever",
+                         y=HEIGHT - 100, size=22, fill=GREEN, center=True))
+    return elements
 
-def create_screenshot_4():
+def _features_layout():
     """Screenshot 4: Features highlight"""
-    img = create_gradient_bg(WIDTH, HEIGHT)
-    draw = ImageDraw.Draw(img)
-    
-    font_large = get_font(48)
-    font_med = get_font(28)
-    font_small = get_font(22)
-    
-    # Title
-    title = "Powerful Features"
-    bbox = draw.textbbox((0, 0), title, font=font_large)
-    text_width = bbox[2] - bbox[0]
-    draw.text(((WIDTH - text_width) // 2, 50), title, fill=WHITE, font=font_large)
-    
-    # Feature cards
     features = [
         ("🎠", "Carousels", "Captures all slides"),
         ("🎬", "Videos", "Download reels & clips"),
@@ -262,54 +164,133 @@ def create_screenshot_4():
     card_w = 350
     card_h = 120
     gap_x = 40
-    gap_y = 30
-    start_x = (WIDTH - (card_w * 2 + gap_x)) // 2
-    start_y = 150
-    
-    for i, (icon, title_text, desc) in enumerate(features):
-        row = i // 2
-        col = i % 2
-        
-        x = start_x + col * (card_w + gap_x)
-        y = start_y + row * (card_h + gap_y)
-        
-        # Card background
-        draw_rounded_rect(draw, (x, y, x + card_w, y + card_h), 16, (40, 40, 65))
-        
-        # Icon circle
-        draw.ellipse([x + 20, y + 25, x + 80, y + 85], fill=PINK)
-        draw.text((x + 35, y + 38), icon, fill=WHITE, font=font_med)
-        
-        # Text
-        draw.text((x + 100, y + 30), title_text, fill=WHITE, font=font_med)
-        draw.text((x + 100, y + 70), desc, fill=GRAY, font=font_small)
-    
-    # Bottom CTA
-    cta = "Install now - It's FREE!"
-    bbox = draw.textbbox((0, 0), cta, font=font_med)
-    text_width = bbox[2] - bbox[0]
-    draw.text(((WIDTH - text_width) // 2, HEIGHT - 80), cta, fill=PINK, font=font_med)
     
-    return img
+    def card(i):
+        icon, title_text, desc = features[i]
+        return [
+            RoundedRect((0, 0, card_w, card_h), 16, (40, 40, 65)),
+            Circle((20, 25, 80, 85), PINK),
+            Text(icon, 35, 38, 28, WHITE),
+            Text(title_text, 100, 30, 28, WHITE),
+            Text(desc, 100, 70, 22, GRAY),
+        ]
+    
+    return [
+        Text("Powerful Features", y=50, size=48, fill=WHITE, center=True),
+        Grid(((WIDTH - (card_w * 2 + gap_x)) // 2, 150), rows=3, cols=2, cell_size=(card_w, card_h),
+             gap=(gap_x, 30), cell=card),
+        # Bottom CTA
+        Text("Install now - It's FREE!", y=HEIGHT - 80, size=28, fill=PINK, center=True),
+    ]
+
+LAYOUTS = {
+    "screenshot-1-popup": _popup_layout(),
+    "screenshot-2-gallery": _gallery_layout(),
+    "screenshot-3-howto": _howto_layout(),
+    "screenshot-4-features": _features_layout(),
+}
+
+@traced
+def render_screenshot(name, size=(WIDTH, HEIGHT), strings=None):
+    """Rasterize one screenshot layout at any store size, optionally translated."""
+    return rasterize(compile_layout(LAYOUTS[name]), size, create_gradient_bg, strings)
+
+@traced
+def create_screenshot_1():
+    """Screenshot 1: Extension popup with stats"""
+    return render_screenshot("screenshot-1-popup")
+
+@traced
+def create_screenshot_2():
+    """Screenshot 2: Gallery view with images"""
+    return render_screenshot("screenshot-2-gallery")
+
+@traced
+def create_screenshot_3():
+    """Screenshot 3: How it works - 3 steps"""
+    return render_screenshot("screenshot-3-howto")
+
+@traced
+def create_screenshot_4():
+    """Screenshot 4: Features highlight"""
+    return render_screenshot("screenshot-4-features")
+
+def variant_filename(name, size, locale):
+    """The default 1280x800 English variant keeps the plain name; others get size/locale suffixes."""
+    suffix = ""
+    if tuple(size) != (WIDTH, HEIGHT):
+        suffix += f"-{size[0]}x{size[1]}"
+    if locale != "en":
+        suffix += f"-{locale}"
+    return f"{name}{suffix}.png"
+
+def screenshot_target_key(name, size=(WIDTH, HEIGHT), locale="en", strings=None):
+    """Build-cache key for one screenshot variant."""
+    params = {
+        "size": tuple(size),
+        "colors": [BG_DARK, BG_GRADIENT_END, PINK, PURPLE, WHITE, GRAY, GREEN],
+        "screenshot": name,
+        "locale": locale,
+        "strings": strings or {},
+    }
+    return target_key(params=params, scripts=module_paths("create_screenshots", "layout", "fonts"),
+                      fonts=fonts.resolved_font_paths())
+
+def _parse_size(value):
+    width, height = value.lower().split("x")
+    return int(width), int(height)
 
 def main():
+    parser = argparse.ArgumentParser(description="Generate Chrome Web Store screenshots.")
+    parser.add_argument("--force", action="store_true",
+                        help="rebuild every screenshot even if its inputs are unchanged")
+    parser.add_argument("--sizes", default=f"{WIDTH}x{HEIGHT}",
+                        help="comma-separated target sizes, e.g. 1280x800,640x400")
+    parser.add_argument("--locales", default="en", help="comma-separated locales to render")
+    parser.add_argument("--strings", metavar="JSON",
+                        help="translations as {locale: {english text: translated text}}")
+    args = parser.parse_args()
+    
     output_dir = "assets/screenshots"
     os.makedirs(output_dir, exist_ok=True)
     
-    screenshots = [
-        ("screenshot-1-popup.png", create_screenshot_1),
-        ("screenshot-2-gallery.png", create_screenshot_2),
-        ("screenshot-3-howto.png", create_screenshot_3),
-        ("screenshot-4-features.png", create_screenshot_4),
-    ]
+    sizes = [_parse_size(value) for value in args.sizes.split(",")]
+    translations = {}
+    if args.strings:
+        with open(args.strings, encoding="utf-8") as f:
+            translations = json.load(f)
+    locales = {locale: translations.get(locale, {}) for locale in args.locales.split(",")}
     
-    for filename, create_func in screenshots:
+    # Lay out once; every size and locale below shares fonts, backgrounds and measurements
+    compiled = {name: compile_layout(elements) for name, elements in LAYOUTS.items()}
+    cache = BuildCache(force=args.force)
+    start = time.perf_counter()
+    
+    def render(filename, display_list, size, strings):
         print(f"Creating {filename}...")
-        img = create_func()
-        img.save(os.path.join(output_dir, filename), "PNG", quality=95)
+        before = fonts.font_stats()
+        started = time.perf_counter()
+        img = rasterize(display_list, size, create_gradient_bg, strings)
+        elapsed = time.perf_counter() - started
+        after = fonts.font_stats()
+        img.save(os.path.join(output_dir, filename), "PNG")
         print(f"  Saved to {output_dir}/{filename}")
-    
-    print("\nDone! Screenshots created in assets/screenshots/")
+        print(f"  Rendered in {elapsed * 1000:.1f} ms "
+              f"(font loads {(after['font_seconds'] - before['font_seconds']) * 1000:.1f} ms, "
+              f"{after['font_hits'] - before['font_hits']} reused; "
+              f"measuring {(after['measure_seconds'] - before['measure_seconds']) * 1000:.1f} ms, "
+              f"{after['measure_hits'] - before['measure_hits']} memoized)")
+    
+    for name, display_list in compiled.items():
+        for size in sizes:
+            for locale, strings in locales.items():
+                filename = variant_filename(name, size, locale)
+                cache.build(os.path.join(output_dir, filename), screenshot_target_key(name, size, locale, strings),
+                            lambda: render(filename, display_list, size, strings))
+    
+    cache.save()
+    cache.report()
+    print(f"\nDone! Screenshots created in assets/screenshots/ in {(time.perf_counter() - start) * 1000:.0f} ms")
     print("Chrome Web Store requires 1280x800 or 640x400 screenshots")
 
 if __name__ == "__main__":
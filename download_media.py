@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+Download the media listed in the gallery's URL exports (instagram-<tab>.txt).
+Lists are streamed, downloads run on a bounded thread pool over per-thread keep-alive connections,
+bodies are written to disk in chunks, and a journal lets an interrupted run resume where it stopped.
+"""
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urljoin, urlsplit
+import argparse
+import hashlib
+import http.client
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+
+DEFAULT_OUTPUT_DIR = "downloads"
+JOURNAL_NAME = ".journal.jsonl"
+DEFAULT_WORKERS = 8
+CHUNK_SIZE = 256 * 1024
+TIMEOUT = 30
+RETRIES = 3
+MAX_REDIRECTS = 5
+USER_AGENT = "instagram-saved-media-exporter/downloader"
+
+def read_url_lists(paths):
+    """Yield (tab, url) from instagram-<tab>.txt files one line at a time, skipping duplicates."""
+    seen = set()
+    for path in paths:
+        match = re.match(r"instagram-(.+)\.txt$", os.path.basename(path))
+        tab = match.group(1) if match else "media"
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                url = line.strip()
+                if url and url not in seen and urlsplit(url).scheme in ("http", "https"):
+                    seen.add(url)
+                    yield tab, url
+
+def target_name(url):
+    """A stable, unique file name: a short hash of the URL plus its original base name."""
+    base = os.path.basename(urlsplit(url).path) or "media"
+    base = re.sub(r"[^\w.-]", "_", base)[-80:]
+    return f"{hashlib.sha1(url.encode()).hexdigest()[:12]}-{base}"
+
+class Journal:
+    """Append-only JSON-lines log of download state; the last record per URL wins."""
+
+    def __init__(self, path):
+        self.path = path
+        self.records = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # a torn last line from an interrupted run
+                    self.records[record["url"]] = record
+        self._file = open(path, "a", encoding="utf-8")
+
+    def get(self, url):
+        return self.records.get(url, {})
+
+    def write(self, **record):
+        with self._lock:
+            self.records[record["url"]] = record
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+class ConnectionPool:
+    """One keep-alive connection per (thread, host), reused across that thread's downloads."""
+
+    def __init__(self, timeout=TIMEOUT):
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connections(self):
+        if not hasattr(self._local, "connections"):
+            self._local.connections = {}
+        return self._local.connections
+
+    def get(self, scheme, netloc):
+        connections = self._connections()
+        key = (scheme, netloc)
+        if key not in connections:
+            cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+            connections[key] = cls(netloc, timeout=self.timeout)
+        return connections[key]
+
+    def discard(self, scheme, netloc):
+        connection = self._connections().pop((scheme, netloc), None)
+        if connection:
+            connection.close()
+
+class HTTPStatusError(http.client.HTTPException):
+    def __init__(self, status, detail=None):
+        super().__init__(f"HTTP {status}" + (f" ({detail})" if detail else ""))
+        self.status = status
+
+    @property
+    def retryable(self):
+        # Expired or missing CDN URLs (403/404/410) will not come back on a retry
+        return self.status >= 500 or self.status in (408, 429)
+
+def _range_start(response):
+    """First byte position of a 206 response's Content-Range, or None if it has none or it is malformed."""
+    match = re.match(r"bytes (\d+)-\d+/(?:\d+|\*)$", response.getheader("Content-Range", "").strip())
+    return int(match.group(1)) if match else None
+
+def _fetch(pool, url, part_path, offset, etag):
+    """Stream one URL into part_path starting at offset. Returns (bytes written, total size, etag)."""
+    for _ in range(MAX_REDIRECTS + 1):
+        parts = urlsplit(url)
+        connection = pool.get(parts.scheme, parts.netloc)
+        headers = {"User-Agent": USER_AGENT, "Accept-Encoding": "identity"}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            if etag:
+                # The server only honours the range if the file is still the one we started
+                headers["If-Range"] = etag
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        try:
+            connection.request("GET", path or "/", headers=headers)
+            response = connection.getresponse()
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            # The server dropped an idle keep-alive connection; one more try on a fresh one
+            pool.discard(parts.scheme, parts.netloc)
+            connection = pool.get(parts.scheme, parts.netloc)
+            try:
+                connection.request("GET", path or "/", headers=headers)
+                response = connection.getresponse()
+            except (OSError, http.client.HTTPException):
+                pool.discard(parts.scheme, parts.netloc)
+                raise
+        except (OSError, http.client.HTTPException):
+            pool.discard(parts.scheme, parts.netloc)
+            raise
+
+        if response.status in (301, 302, 303, 307, 308):
+            response.read()
+            location = response.getheader("Location")
+            if not location:
+                raise HTTPStatusError(response.status, "redirect without a Location header")
+            # Location may be relative to the URL that redirected
+            url = urljoin(url, location)
+            continue
+        if response.status == 416 and offset:
+            # The partial file is already complete
+            response.read()
+            return 0, offset, etag
+        if response.status not in (200, 206):
+            response.read()
+            raise HTTPStatusError(response.status)
+
+        if response.status == 206 and _range_start(response) != offset:
+            # Not the range we asked for; drop the connection with the body unread and start over
+            pool.discard(parts.scheme, parts.netloc)
+            offset, etag = 0, None
+            continue
+        if response.status == 200:
+            offset = 0
+        etag = response.getheader("ETag") or etag
+        length = response.getheader("Content-Length")
+        total = offset + int(length) if length is not None else None
+
+        written = 0
+        with open(part_path, "ab" if offset else "wb") as f:
+            try:
+                while True:
+                    chunk = response.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    written += len(chunk)
+            except (OSError, http.client.HTTPException):
+                pool.discard(parts.scheme, parts.netloc)
+                raise
+        if response.will_close or (total is not None and offset + written != total):
+            pool.discard(parts.scheme, parts.netloc)
+        if total is not None and offset + written != total:
+            raise http.client.IncompleteRead(b"", total - offset - written)
+        return written, offset + written, etag
+    raise http.client.HTTPException(f"too many redirects for {url}")
+
+def download(pool, journal, tab, url, output_dir, retries=RETRIES):
+    """Download one URL, resuming a partial file. Returns a result dict for the report."""
+    path = os.path.join(output_dir, tab, target_name(url))
+    record = journal.get(url)
+    if record.get("state") == "done" and os.path.exists(path):
+        return {"url": url, "state": "skipped", "bytes": 0, "seconds": 0.0}
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    part_path = path + ".part"
+    start = time.perf_counter()
+    initial = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    resumed = initial > 0
+    etag = record.get("etag")
+    failures = 0
+    while True:
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        resumed = resumed or offset > 0
+        try:
+            _, size, etag = _fetch(pool, url, part_path, offset, etag)
+            break
+        except (OSError, http.client.HTTPException) as e:
+            # Keep what arrived; the next attempt (or run) continues from there
+            error = str(e) or type(e).__name__
+            now = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            progressed = now > offset
+            # A transfer that made progress retries at once; only stalls count and back off
+            failures += 0 if progressed else 1
+            if failures > retries or not getattr(e, "retryable", True):
+                journal.write(url=url, path=path, state="failed", etag=etag, error=error)
+                return {"url": url, "state": "failed", "bytes": max(0, now - initial),
+                        "seconds": time.perf_counter() - start, "error": error}
+            journal.write(url=url, path=path, state="partial", etag=etag, error=error)
+            if not progressed:
+                time.sleep(0.2 * 2 ** (failures - 1))
+
+    os.replace(part_path, path)
+    journal.write(url=url, path=path, state="done", etag=etag, size=size)
+    return {"url": url, "state": "resumed" if resumed else "done", "bytes": max(0, size - initial),
+            "seconds": time.perf_counter() - start}
+
+def download_all(items, output_dir=DEFAULT_OUTPUT_DIR, workers=DEFAULT_WORKERS, retries=RETRIES):
+    """Download (tab, url) items with at most `workers` in flight. Returns the list of results."""
+    os.makedirs(output_dir, exist_ok=True)
+    journal = Journal(os.path.join(output_dir, JOURNAL_NAME))
+    pool = ConnectionPool()
+    results = []
+    try:
+        with ThreadPoolExecutor(workers) as executor:
+            running = set()
+            # Submit lazily so a list of any length only ever has a few items queued
+            for tab, url in items:
+                if len(running) >= workers * 2:
+                    done, running = wait(running, return_when=FIRST_COMPLETED)
+                    results.extend(future.result() for future in done)
+                running.add(executor.submit(download, pool, journal, tab, url, output_dir, retries))
+            results.extend(future.result() for future in running)
+    finally:
+        journal.close()
+    return results
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+def print_report(results, elapsed):
+    """Print counts, throughput and per-file latency percentiles."""
+    counts = {}
+    for result in results:
+        counts[result["state"]] = counts.get(result["state"], 0) + 1
+    total_bytes = sum(result["bytes"] for result in results)
+    latencies = [result["seconds"] * 1000 for result in results if result["state"] in ("done", "resumed")]
+    print(", ".join(f"{count} {state}" for state, count in sorted(counts.items())) or "nothing to do")
+    print(f"{total_bytes / 2**20:.1f} MiB in {elapsed:.2f} s "
+          f"({total_bytes / 2**20 / elapsed if elapsed else 0:.1f} MiB/s, "
+          f"{len(latencies) / elapsed if elapsed else 0:.1f} files/s)")
+    if latencies:
+        print(f"latency per file: p50 {_percentile(latencies, 0.5):.0f} ms, p95 {_percentile(latencies, 0.95):.0f} ms, "
+              f"p99 {_percentile(latencies, 0.99):.0f} ms, max {max(latencies):.0f} ms")
+    for result in results:
+        if result["state"] == "failed":
+            print(f"  failed: {result['url']} ({result['error']})")
+
+# Local stand-in for the CDN, used by --selftest
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serves files from server.root with ETag and Range support.
+
+    The first response for each file is cut off halfway (when server.flaky is set), so clients
+    have to resume. Paths under /go/ answer with a relative redirect to the same file under /media/.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        if parts.path.startswith("/go/"):
+            self.send_response(302)
+            self.send_header("Location", f"../media/{os.path.basename(parts.path)}?{parts.query}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        path = os.path.join(self.server.root, os.path.basename(parts.path))
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+        with open(path, "rb") as f:
+            data = f.read()
+        etag = f'"{hashlib.sha1(data).hexdigest()}"'
+        start = 0
+        match = re.match(r"bytes=(\d+)-$", self.headers.get("Range", ""))
+        if match and self.headers.get("If-Range", etag) == etag:
+            start = int(match.group(1))
+            if start >= len(data):
+                self.send_response(416)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+        else:
+            self.send_response(200)
+        body = data[start:]
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+
+        with self.server.lock:
+            cut = self.server.flaky and path not in self.server.cut
+            self.server.cut.add(path)
+        if cut:
+            self.wfile.write(body[:len(body) // 2])
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+def serve_stand_in(root, flaky=False):
+    """Start the stand-in server on a free local port in a background thread. Returns the server."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.root, server.flaky, server.cut, server.lock = root, flaky, set(), threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def selftest(files=200, size=256 * 1024, workers=DEFAULT_WORKERS):
+    """Download from the local stand-in with every first response cut short, then check every byte.
+
+    Every other URL goes through a relative redirect first.
+    """
+    workdir = tempfile.mkdtemp()
+    try:
+        served = os.path.join(workdir, "served")
+        os.makedirs(served)
+        expected = {}
+        for i in range(files):
+            data = os.urandom(size + i)
+            with open(os.path.join(served, f"{i:05}_n.jpg"), "wb") as f:
+                f.write(data)
+            expected[f"{i:05}_n.jpg"] = hashlib.sha1(data).hexdigest()
+
+        server = serve_stand_in(served, flaky=True)
+        list_path = os.path.join(workdir, "instagram-images.txt")
+        with open(list_path, "w") as f:
+            for i, name in enumerate(expected):
+                f.write(f"http://127.0.0.1:{server.server_address[1]}/{'go' if i % 2 else 'media'}/{name}"
+                        f"?stp=dst-jpg\n")
+
+        output_dir = os.path.join(workdir, "downloads")
+        for label in ("interrupted run (every file cut halfway, resumed)", "second run (journal)"):
+            start = time.perf_counter()
+            results = download_all(read_url_lists([list_path]), output_dir, workers)
+            print(f"{label}:")
+            print_report(results, time.perf_counter() - start)
+        server.shutdown()
+
+        bad = [name for name, digest in expected.items()
+               if not any(entry.endswith(name) and hashlib.sha1(open(os.path.join(output_dir, "images", entry), "rb")
+                                                              .read()).hexdigest() == digest
+                          for entry in os.listdir(os.path.join(output_dir, "images")))]
+        print("all files intact" if not bad else f"{len(bad)} files corrupt or missing")
+        return not bad
+    finally:
+        shutil.rmtree(workdir)
+
+def main():
+    parser = argparse.ArgumentParser(description="Download media from the gallery's exported URL lists.")
+    parser.add_argument("lists", nargs="*", help="instagram-<tab>.txt files (default: instagram-*.txt here)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_DIR, help="download directory (one folder per tab)")
+    parser.add_argument("--workers", "-j", type=int, default=DEFAULT_WORKERS, help="concurrent downloads")
+    parser.add_argument("--retries", type=int, default=RETRIES, help="attempts per file after the first")
+    parser.add_argument("--selftest", action="store_true",
+                        help="exercise the downloader against a local stand-in server and exit")
+    args = parser.parse_args()
+
+    if args.selftest:
+        raise SystemExit(0 if selftest(workers=args.workers) else 1)
+
+    lists = args.lists or sorted(name for name in os.listdir(".") if re.match(r"instagram-.+\.txt$", name))
+    if not lists:
+        parser.error("no instagram-<tab>.txt lists given or found")
+    start = time.perf_counter()
+    results = download_all(read_url_lists(lists), args.output, args.workers, args.retries)
+    print_report(results, time.perf_counter() - start)
+
+if __name__ == "__main__":
+    main()
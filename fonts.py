@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Process-wide font registry for the screenshot generators.
+Each (face, size) is resolved and loaded once, and text measurements are memoized.
+"""
+
+from PIL import Image, ImageDraw, ImageFont
+import os
+import time
+
+# Candidate files per logical face, in order of preference (macOS, then common Linux/Windows fonts)
+FONT_FACES = {
+    "sans": [
+        "Helvetica.ttc", "SFNSText.ttf", "Arial.ttf", "arial.ttf",
+        "DejaVuSans.ttf", "LiberationSans-Regular.ttf", "NotoSans-Regular.ttf", "FreeSans.ttf",
+    ],
+}
+
+FONT_DIRS = [
+    "/System/Library/Fonts",
+    "/Library/Fonts",
+    os.path.expanduser("~/Library/Fonts"),
+    "/usr/share/fonts",
+    "/usr/local/share/fonts",
+    os.path.expanduser("~/.local/share/fonts"),
+    os.path.expanduser("~/.fonts"),
+    "C:\\Windows\\Fonts",
+]
+
+# Scratch surface so measurements match draw.textbbox on the RGB screenshots exactly
+_scratch = ImageDraw.Draw(Image.new('RGB', (1, 1)))
+
+_font_index = None
+_resolved = {}
+_fonts = {}
+_metrics = {}
+_stats = {
+    "font_loads": 0,
+    "font_hits": 0,
+    "font_seconds": 0.0,
+    "measure_misses": 0,
+    "measure_hits": 0,
+    "measure_seconds": 0.0,
+}
+
+def _index_fonts():
+    """Walk the font directories once and map lower-cased file names to paths."""
+    global _font_index
+    if _font_index is None:
+        _font_index = {}
+        for font_dir in FONT_DIRS:
+            for root, _, files in os.walk(font_dir):
+                for name in files:
+                    _font_index.setdefault(name.lower(), os.path.join(root, name))
+    return _font_index
+
+def resolve_font(face="sans"):
+    """Return the path of the first installed file for face, or None to use Pillow's default font."""
+    if face not in _resolved:
+        index = _index_fonts()
+        _resolved[face] = next((index[name.lower()] for name in FONT_FACES[face] if name.lower() in index), None)
+    return _resolved[face]
+
+def resolved_font_paths():
+    """Paths of every face resolved so far, for build-cache keys."""
+    return sorted(path for path in (resolve_font(face) for face in FONT_FACES) if path)
+
+def get_font(size, face="sans"):
+    """Get a font, falling back to default if needed. Loaded once per (face, size)."""
+    key = (face, size)
+    font = _fonts.get(key)
+    if font is not None:
+        _stats["font_hits"] += 1
+        return font
+
+    start = time.perf_counter()
+    path = resolve_font(face)
+    try:
+        font = ImageFont.truetype(path, size) if path else ImageFont.load_default()
+    except OSError:
+        font = ImageFont.load_default()
+    _fonts[key] = font
+    _stats["font_loads"] += 1
+    _stats["font_seconds"] += time.perf_counter() - start
+    return font
+
+def text_bbox(text, font):
+    """Return the bounding box of text as draw.textbbox((0, 0), ...) would, memoized per (text, font)."""
+    key = (text, id(font))
+    cached = _metrics.get(key)
+    if cached is not None:
+        _stats["measure_hits"] += 1
+        return cached[1]
+
+    start = time.perf_counter()
+    bbox = _scratch.textbbox((0, 0), text, font=font)
+    # Keep a reference to the font so its id() can never be reused by another object
+    _metrics[key] = (font, bbox)
+    _stats["measure_misses"] += 1
+    _stats["measure_seconds"] += time.perf_counter() - start
+    return bbox
+
+def text_width(text, font):
+    """Return the rendered width of text."""
+    bbox = text_bbox(text, font)
+    return bbox[2] - bbox[0]
+
+def font_stats():
+    """Return a copy of the load/measure counters and time spent, in seconds."""
+    return dict(_stats)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Linear gradient engine for the icon generators.
+Renders multi-stop gradients at any angle with NumPy instead of per-pixel putpixel.
+The pure-Python backend computes the same colors position by position.
+"""
+
+from PIL import Image
+import bisect
+import math
+
+from backends import np
+import backends
+
+# Integer direction vectors for multiples of 45 degrees (0 = left to right, 90 = top to bottom).
+# Using exact integers keeps the classic diagonal gradient byte-identical to the old per-pixel loop.
+EXACT_DIRECTIONS = [(1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)]
+
+def parse_hex_color(color):
+    """Parse a '#RRGGBB' string into an (r, g, b) tuple."""
+    return int(color[1:3], 16), int(color[3:5], 16), int(color[5:7], 16)
+
+def _direction(angle):
+    """Return the (dx, dy) direction vector for an angle in degrees."""
+    if angle % 45 == 0:
+        return EXACT_DIRECTIONS[int(angle // 45) % 8]
+    rad = math.radians(angle)
+    return math.cos(rad), math.sin(rad)
+
+def _normalize_stops(stops):
+    """Turn a list of colors or (position, color) pairs into position and RGB arrays."""
+    if len(stops) < 2:
+        raise ValueError("A gradient needs at least two color stops")
+
+    positions = []
+    colors = []
+    for i, stop in enumerate(stops):
+        if isinstance(stop, (tuple, list)) and len(stop) == 2:
+            position, color = stop
+        else:
+            # Evenly spaced stops when no explicit positions are given
+            position, color = i / (len(stops) - 1), stop
+        if isinstance(color, str):
+            color = parse_hex_color(color)
+        positions.append(float(position))
+        colors.append(color[:3])
+
+    order = sorted(range(len(positions)), key=lambda i: positions[i])
+    return [positions[i] for i in order], [tuple(colors[i]) for i in order]
+
+def gradient_positions(size, angle=45):
+    """Return the 0..1 gradient position of every pixel as a (height, width) float array."""
+    width, height = (size, size) if isinstance(size, int) else size
+    dx, dy = _direction(angle)
+
+    # With integer directions this stays an exact integer projection divided once,
+    # which matches the old (x + y) / (2 * size) diagonal bit for bit
+    offset = (width - 1) * min(dx, 0) + (height - 1) * min(dy, 0)
+    projection = (np.arange(width, dtype=np.int64)[None, :] * dx
+                  + np.arange(height, dtype=np.int64)[:, None] * dy - offset)
+    span = width * abs(dx) + height * abs(dy)
+
+    return projection / span
+
+def _gradient_colors(positions, colors, t):
+    """Interpolate the color stops at the positions in t, returning uint8 RGBA values."""
+    # Find the segment each position falls in, then interpolate within it
+    segment = np.clip(np.searchsorted(positions, t, side='right') - 1, 0, len(positions) - 2)
+    start = positions[segment]
+    width = positions[segment + 1] - start
+    # A zero-width segment is a hard stop: the earlier color before it, the later one from it on
+    local_t = np.where(width > 0, np.clip((t - start) / np.where(width > 0, width, 1.0), 0.0, 1.0), t >= start)
+
+    rgba = np.empty(t.shape + (4,), dtype=np.uint8)
+    for channel in range(3):
+        c1 = colors[segment, channel]
+        c2 = colors[segment + 1, channel]
+        # Same operation order as int(c1 + (c2 - c1) * t) so truncation matches
+        rgba[..., channel] = np.trunc(c1 + (c2 - c1) * local_t)
+    rgba[..., 3] = 255
+    return rgba
+
+def _gradient_color_python(positions, colors, t):
+    """One RGBA color with the same segment search, clipping and truncation as _gradient_colors."""
+    segment = min(max(bisect.bisect_right(positions, t) - 1, 0), len(positions) - 2)
+    start = positions[segment]
+    width = positions[segment + 1] - start
+    local_t = min(max((t - start) / width, 0.0), 1.0) if width > 0 else float(t >= start)
+    c1, c2 = colors[segment], colors[segment + 1]
+    return bytes([int(c1[channel] + (c2[channel] - c1[channel]) * local_t) for channel in range(3)] + [255])
+
+def _linear_gradient_python(size, positions, colors, angle):
+    width, height = (size, size) if isinstance(size, int) else size
+    dx, dy = _direction(angle)
+    offset = (width - 1) * min(dx, 0) + (height - 1) * min(dy, 0)
+    span = width * abs(dx) + height * abs(dy)
+
+    if isinstance(dx, int) and isinstance(dy, int):
+        # As in the NumPy path: color each distinct position once, then index rows into the table
+        steps = (width - 1) * abs(dx) + (height - 1) * abs(dy) + 1
+        table = [_gradient_color_python(positions, colors, step / span) for step in range(steps)]
+        rows = (b"".join(table[x * dx + y * dy - offset] for x in range(width)) for y in range(height))
+    else:
+        rows = (b"".join(_gradient_color_python(positions, colors, (x * dx + y * dy - offset) / span)
+                         for x in range(width)) for y in range(height))
+    return Image.frombytes("RGBA", (width, height), b"".join(rows))
+
+def linear_gradient(size, stops, angle=45):
+    """Render an opaque RGBA linear gradient of the given size from a list of color stops."""
+    return linear_gradients([size], stops, angle)[size]
+
+def linear_gradients(sizes, stops, angle=45):
+    """Render the same gradient at a batch of sizes, returning {size: image}.
+
+    The stops are parsed and the direction resolved once for the whole batch; with an integer
+    direction every size colors a slice of one shared step index.
+    """
+    positions, colors = _normalize_stops(stops)
+    if backends.active() == "python":
+        return {size: _linear_gradient_python(size, positions, colors, angle) for size in sizes}
+    positions, colors = np.array(positions, dtype=np.float64), np.array(colors, dtype=np.int64)
+    dx, dy = _direction(angle)
+
+    if not (isinstance(dx, int) and isinstance(dy, int)):
+        return {size: Image.fromarray(_gradient_colors(positions, colors, gradient_positions(size, angle)))
+                for size in sizes}
+
+    # Integer directions only produce (width - 1) * |dx| + (height - 1) * |dy| + 1 distinct
+    # positions: color those once, then lay them out with a strided view (one C-level copy)
+    dimensions = {size: (size, size) if isinstance(size, int) else size for size in sizes}
+    steps = {size: (width - 1) * abs(dx) + (height - 1) * abs(dy) + 1 for size, (width, height) in dimensions.items()}
+    index = np.arange(max(steps.values(), default=0), dtype=np.int64)
+
+    images = {}
+    for size, (width, height) in dimensions.items():
+        span = width * abs(dx) + height * abs(dy)
+        table = _gradient_colors(positions, colors, index[:steps[size]] / span)
+        offset = (width - 1) * min(dx, 0) + (height - 1) * min(dy, 0)
+        pixel = table.strides[0]
+        view = np.lib.stride_tricks.as_strided(
+            table[-offset:], shape=(height, width, 4), strides=(dy * pixel, dx * pixel, 1))
+        images[size] = Image.fromarray(np.ascontiguousarray(view))
+    return images
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Package the rendered icons for web pages in one pass: a sprite atlas with a coordinates JSON,
+a multi-resolution favicon.ico and an Apple touch icon / favicon PNG set.
+The sizes create_icons already rendered are decoded once and shared by every output; sizes it does
+not render are derived from the nearest larger level, and each size is PNG-encoded only once.
+"""
+
+from PIL import Image
+import argparse
+import io
+import json
+import os
+import struct
+import time
+
+from buildcache import BuildCache, module_paths, target_key
+import create_icons
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ICONS_DIR = os.path.join(SCRIPT_DIR, "assets", "icons")
+DEFAULT_OUTPUT_DIR = os.path.join(SCRIPT_DIR, "build", "icons")
+
+ATLAS_NAME = "icon-atlas.png"
+ATLAS_JSON_NAME = "icon-atlas.json"
+ATLAS_SIZES = create_icons.ICON_SIZES
+# Transparent pixels between sprites, so scaled or filtered sprites do not bleed into each other
+ATLAS_PADDING = 2
+ICO_NAME = "favicon.ico"
+ICO_SIZES = [16, 32, 48, 64, 128, 256]
+FAVICON_PNGS = {
+    "favicon-16x16.png": 16,
+    "favicon-32x32.png": 32,
+    "apple-touch-icon.png": 180,
+    "icon-192.png": 192,
+    "icon-512.png": 512,
+}
+# iOS rounds the corners itself and turns transparent pixels black, so this one is full-bleed
+OPAQUE_PNGS = {"apple-touch-icon.png"}
+
+def rendered_paths(icons_dir=ICONS_DIR):
+    """The icon files create_icons writes, by size."""
+    return create_icons.output_paths(icons_dir)
+
+def load_levels(icons_dir=ICONS_DIR):
+    """Decode every rendered size once."""
+    levels = {}
+    for size, path in rendered_paths(icons_dir).items():
+        if os.path.exists(path):
+            img = Image.open(path).convert("RGBA")
+            if img.size != (size, size):
+                raise ValueError(f"{path} is {img.size[0]}x{img.size[1]}, expected {size}x{size}")
+            levels[size] = img
+    if not levels:
+        raise FileNotFoundError(f"no rendered icons in {icons_dir}; run create_icons.py first")
+    return levels
+
+def derive_levels(levels, sizes):
+    """Add the sizes that were not rendered, largest first, each from the best larger level."""
+    for size in sorted(set(sizes) - set(levels), reverse=True):
+        levels[size] = create_icons.downsample(levels[create_icons.pyramid_parent(levels, size)], size)
+    return levels
+
+def encode_png(img):
+    buffer = io.BytesIO()
+    img.save(buffer, "PNG")
+    return buffer.getvalue()
+
+def pack_atlas(levels, sizes=ATLAS_SIZES, padding=ATLAS_PADDING):
+    """Place the sizes side by side, largest first. Returns (atlas image, {name: frame})."""
+    sizes = sorted(sizes, reverse=True)
+    width = sum(sizes) + padding * (len(sizes) + 1)
+    atlas = Image.new("RGBA", (width, sizes[0] + 2 * padding), (0, 0, 0, 0))
+    frames = {}
+    x = padding
+    for size in sizes:
+        atlas.paste(levels[size], (x, padding))
+        frames[f"icon-{size}"] = {"x": x, "y": padding, "w": size, "h": size}
+        x += size + padding
+    return atlas, frames
+
+def write_ico(path, pngs):
+    """Write a .ico whose entries are the given PNG files ({size: bytes}), smallest first."""
+    sizes = sorted(pngs)
+    header = struct.pack("<HHH", 0, 1, len(sizes))
+    entries, offset = [], 6 + 16 * len(sizes)
+    for size in sizes:
+        # A width/height byte of 0 means 256
+        entries.append(struct.pack("<BBBBHHII", size % 256, size % 256, 0, 0, 1, 32, len(pngs[size]), offset))
+        offset += len(pngs[size])
+    with open(path, "wb") as f:
+        f.write(header + b"".join(entries) + b"".join(pngs[size] for size in sizes))
+
+def flatten(img):
+    """Fill an icon's transparent corners with the gradient it sits on."""
+    background = create_icons.create_gradient_background(img.size[0], create_icons.GRADIENT_COLOR1,
+                                                         create_icons.GRADIENT_COLOR2)
+    return Image.alpha_composite(background, img).convert("RGB")
+
+def build_pack(icons_dir=ICONS_DIR, output_dir=DEFAULT_OUTPUT_DIR):
+    """Write the atlas, its JSON, the .ico and the PNG set. Returns the written paths."""
+    os.makedirs(output_dir, exist_ok=True)
+    levels = derive_levels(load_levels(icons_dir), ATLAS_SIZES + ICO_SIZES + list(FAVICON_PNGS.values()))
+
+    pngs = {}
+    def png(size):
+        if size not in pngs:
+            pngs[size] = encode_png(levels[size])
+        return pngs[size]
+
+    written = []
+    for name, size in FAVICON_PNGS.items():
+        path = os.path.join(output_dir, name)
+        with open(path, "wb") as f:
+            f.write(encode_png(flatten(levels[size])) if name in OPAQUE_PNGS else png(size))
+        written.append(path)
+
+    ico_path = os.path.join(output_dir, ICO_NAME)
+    write_ico(ico_path, {size: png(size) for size in ICO_SIZES})
+    written.append(ico_path)
+
+    atlas, frames = pack_atlas(levels)
+    atlas_path = os.path.join(output_dir, ATLAS_NAME)
+    atlas.save(atlas_path, "PNG")
+    written.append(atlas_path)
+
+    # Written last: the build cache records this file for the whole pack
+    json_path = os.path.join(output_dir, ATLAS_JSON_NAME)
+    with open(json_path, "w") as f:
+        json.dump({"image": ATLAS_NAME, "width": atlas.width, "height": atlas.height, "frames": frames,
+                   "files": sorted(os.path.basename(path) for path in written)}, f, indent=2)
+        f.write("\n")
+    written.append(json_path)
+    return written
+
+def pack_target_key(icons_dir=ICONS_DIR):
+    """Build-cache key for the pack: the rendered icons plus the layout of every output."""
+    params = {
+        "atlas": [ATLAS_SIZES, ATLAS_PADDING],
+        "ico": ICO_SIZES,
+        "pngs": FAVICON_PNGS,
+        "opaque": sorted(OPAQUE_PNGS),
+        "colors": [create_icons.GRADIENT_COLOR1, create_icons.GRADIENT_COLOR2],
+    }
+    return target_key(files=sorted(rendered_paths(icons_dir).values()), params=params,
+                      scripts=module_paths("icon_pack", "create_icons", "gradients"))
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the icon atlas, favicon.ico and favicon PNGs in one pass.")
+    parser.add_argument("--icons-dir", default=ICONS_DIR, help="directory with the rendered icon-<size>.png files")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_DIR, help="directory to write the pack to")
+    parser.add_argument("--force", action="store_true", help="rebuild even if the rendered icons are unchanged")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    cache = BuildCache(force=args.force)
+    written = []
+    cache.build(os.path.join(args.output, ATLAS_JSON_NAME), pack_target_key(args.icons_dir),
+                lambda: written.extend(build_pack(args.icons_dir, args.output)))
+    cache.save()
+    for path in written:
+        print(f"Created: {os.path.relpath(path)} ({os.path.getsize(path):,} bytes)")
+    cache.report()
+    print(f"Icon pack done in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+if __name__ == "__main__":
+    main()
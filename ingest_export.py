@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Ingest igExporterData dumps (chrome.storage.local exports) into an indexed SQLite database.
+Dumps are parsed incrementally, one media item at a time, so memory stays flat however many posts
+were captured. Re-ingesting merges: known media are skipped via the same URL key the extension uses.
+"""
+
+from urllib.parse import unquote_plus
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+
+DEFAULT_DB = "igexporter.sqlite"
+READ_SIZE = 1024 * 1024
+BATCH_SIZE = 5000
+# The arrays of igExporterData (see saveToStorage in content.js)
+SECTIONS = ("images", "videos", "carousels")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    shortcode TEXT PRIMARY KEY,
+    post_url TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS media (
+    id INTEGER PRIMARY KEY,
+    url_key TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,
+    url TEXT,
+    thumbnail TEXT,
+    post_url TEXT,
+    shortcode TEXT,
+    carousel_index INTEGER,
+    scraped_at TEXT
+);
+CREATE INDEX IF NOT EXISTS media_shortcode ON media (shortcode, carousel_index);
+CREATE INDEX IF NOT EXISTS media_kind ON media (kind, id);
+CREATE TABLE IF NOT EXISTS carousels (
+    shortcode TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS dumps (
+    sha256 TEXT PRIMARY KEY,
+    path TEXT,
+    ingested_at TEXT,
+    items INTEGER,
+    added INTEGER
+) WITHOUT ROWID;
+"""
+
+URL_PARTS = re.compile(r"[A-Za-z][A-Za-z0-9+.-]*://[^/?#]*([^?#]*)(?:\?([^#]*))?")
+SHORTCODE = re.compile(r"/(?:p|reel|tv)/([A-Za-z0-9_-]+)")
+
+def normalize_url(url):
+    """Dedupe key for a media URL, as normalizeUrl in content.js: path plus ig_cache_key and stp."""
+    if not url or not isinstance(url, str):
+        return None
+    # A regex instead of urlsplit/parse_qs: this runs once per item and dominated ingest time
+    match = URL_PARTS.match(url)
+    if not match:
+        return url
+    path, query = match.group(1) or "/", match.group(2) or ""
+    values = []
+    for name in ("ig_cache_key", "stp"):
+        param = re.search(rf"(?:^|&){name}=([^&]*)", query)
+        value = param.group(1) if param else ""
+        values.append(unquote_plus(value) if "%" in value or "+" in value else value)
+    return "|".join([path] + values)
+
+def shortcode_of(post_url):
+    match = SHORTCODE.search(post_url) if isinstance(post_url, str) else None
+    return match.group(1) if match else None
+
+class _JsonStream:
+    """Just enough of an incremental JSON reader to walk objects and arrays without loading the file.
+
+    Scalars and array elements are decoded with json's raw_decode from a buffer that is refilled
+    from the file as needed and trimmed behind the read position.
+    """
+
+    def __init__(self, f):
+        self._file = f
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self):
+        if self._eof:
+            return False
+        chunk = self._file.read(READ_SIZE)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self):
+        """Next non-whitespace character, or '' at the end of the input."""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in " \t\r\n":
+                self._pos += 1
+            if self._pos < len(self._buffer) or not self._fill():
+                return self._buffer[self._pos:self._pos + 1]
+
+    def expect(self, chars):
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f"expected one of {chars!r}, found {char or 'end of input'!r}")
+        self._pos += 1
+        return char
+
+    def value(self):
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A number or literal cut at the buffer end would decode short; make sure it was complete
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def items(self):
+        """Iterate over the keys of an object; the caller must consume each key's value before the next."""
+        self.expect("{")
+        if self.peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            if self.expect(",}") == "}":
+                return
+
+    def elements(self):
+        """Iterate over the decoded elements of an array."""
+        self.expect("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(",]") == "]":
+                return
+
+def iter_dump(path):
+    """Yield (section, item) for every element of images/videos/carousels in a dump.
+
+    Accepts both a chrome.storage.local.get(null) export ({"igExporterData": {...}, ...}) and a bare
+    igExporterData object. Other keys are skipped.
+    """
+    with open(path, encoding="utf-8") as f:
+        stream = _JsonStream(f)
+
+        def walk(depth):
+            for key in stream.items():
+                if key in SECTIONS and stream.peek() == "[":
+                    for item in stream.elements():
+                        yield key, item
+                elif key == "igExporterData" and depth == 0 and stream.peek() == "{":
+                    yield from walk(1)
+                else:
+                    stream.value()
+        yield from walk(0)
+
+def connect(db_path=DEFAULT_DB):
+    db = sqlite3.connect(db_path)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.executescript(SCHEMA)
+    return db
+
+def _media_row(section, item):
+    """(url_key, kind, url, thumbnail, post_url, shortcode, carousel_index, scraped_at) or None."""
+    if not isinstance(item, dict):
+        return None
+    # Fields of an unexpected type are treated as missing rather than failing the whole dump
+    text = {}
+    for name in ("url", "postUrl", "type", "thumbnail", "shortcode", "scrapedAt"):
+        value = item.get(name)
+        text[name] = value if isinstance(value, str) else None
+    url, post_url = text["url"], text["postUrl"]
+    kind = text["type"] or section[:-1]
+    # Videos without a direct URL are keyed by their post, as addVideo does
+    key = normalize_url(url or (post_url if kind == "video" else None))
+    if not key:
+        return None
+    index = item.get("carouselIndex")
+    return (key, kind, url, text["thumbnail"], post_url, text["shortcode"] or shortcode_of(post_url),
+            index if isinstance(index, int) else None, text["scrapedAt"])
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(READ_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _flush(db, rows, carousels):
+    before = db.total_changes
+    db.executemany("INSERT INTO media (url_key, kind, url, thumbnail, post_url, shortcode, carousel_index, "
+                   "scraped_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (url_key) DO NOTHING", rows)
+    added = db.total_changes - before
+    db.executemany("INSERT INTO posts (shortcode, post_url) VALUES (?, ?) ON CONFLICT DO NOTHING",
+                   {(row[5], row[4]) for row in rows if row[5] and row[4]})
+    db.executemany("INSERT INTO carousels (shortcode, data) VALUES (?, ?) "
+                   "ON CONFLICT (shortcode) DO UPDATE SET data = excluded.data", carousels)
+    db.executemany("INSERT INTO touched (shortcode) VALUES (?) ON CONFLICT DO NOTHING",
+                   {(row[5],) for row in rows if row[5]})
+    return added
+
+def ingest(db, path, force=False):
+    """Merge one dump into db. Returns (items read, media added), or None if this dump was already ingested.
+
+    Slide numbers are inferred from capture order for posts with several media. Two CDN sizes of the same
+    single image (different stp) are distinct media, so such a post is numbered as slides 1 and 2.
+    """
+    digest = _file_digest(path)
+    if not force and db.execute("SELECT 1 FROM dumps WHERE sha256 = ?", (digest,)).fetchone():
+        return None
+
+    items = added = 0
+    rows, carousels = [], []
+    with db:
+        db.execute("CREATE TEMP TABLE IF NOT EXISTS touched (shortcode TEXT PRIMARY KEY) WITHOUT ROWID")
+        db.execute("DELETE FROM touched")
+        for section, item in iter_dump(path):
+            items += 1
+            if section == "carousels":
+                # content.js never fills this array, so accept a post object or a post URL and skip the rest
+                if isinstance(item, dict):
+                    shortcode = item.get("shortcode") or shortcode_of(item.get("postUrl"))
+                else:
+                    shortcode = shortcode_of(item)
+                if isinstance(shortcode, str) and shortcode:
+                    carousels.append((shortcode, json.dumps(item)))
+            else:
+                row = _media_row(section, item)
+                if row:
+                    rows.append(row)
+            if len(rows) + len(carousels) >= BATCH_SIZE:
+                added += _flush(db, rows, carousels)
+                rows, carousels = [], []
+        added += _flush(db, rows, carousels)
+
+        # The extension appends a carousel's slides in order, so a post's position among its media is
+        # its slide number. Only posts touched by this dump are renumbered; explicit indices are kept.
+        db.execute("""
+            UPDATE media SET carousel_index = numbered.position
+            FROM (SELECT id, ROW_NUMBER() OVER (PARTITION BY shortcode ORDER BY id) AS position,
+                         COUNT(*) OVER (PARTITION BY shortcode) AS slides
+                  FROM media WHERE shortcode IN (SELECT shortcode FROM touched)) AS numbered
+            WHERE media.id = numbered.id AND numbered.slides > 1 AND media.carousel_index IS NULL
+        """)
+        db.execute("INSERT INTO dumps (sha256, path, ingested_at, items, added) VALUES (?, ?, ?, ?, ?) "
+                   "ON CONFLICT (sha256) DO UPDATE SET ingested_at = excluded.ingested_at, added = excluded.added",
+                   (digest, os.path.abspath(path), time.strftime("%Y-%m-%dT%H:%M:%S"), items, added))
+    return items, added
+
+def lookup(db, shortcode):
+    """Media of one post in slide order, as dicts."""
+    cursor = db.execute("SELECT kind, url, thumbnail, post_url, carousel_index, scraped_at FROM media "
+                        "WHERE shortcode = ? ORDER BY carousel_index, id", (shortcode,))
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor]
+
+def stats(db):
+    counts = dict(db.execute("SELECT kind, COUNT(*) FROM media GROUP BY kind").fetchall())
+    counts["posts"] = db.execute("SELECT COUNT(*) FROM posts").fetchone()[0]
+    counts["carousels"] = db.execute("SELECT COUNT(DISTINCT shortcode) FROM media WHERE carousel_index IS NOT NULL"
+                                     ).fetchone()[0]
+    counts["dumps"] = db.execute("SELECT COUNT(*) FROM dumps").fetchone()[0]
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest igExporterData dumps into SQLite and query them.")
+    parser.add_argument("dumps", nargs="*", help="JSON dumps of chrome.storage.local or igExporterData")
+    parser.add_argument("--db", default=DEFAULT_DB, help="SQLite database to create or merge into")
+    parser.add_argument("--force", action="store_true", help="re-read dumps that were already ingested")
+    parser.add_argument("--lookup", metavar="SHORTCODE", action="append", default=[], help="print a post's media")
+    args = parser.parse_args()
+
+    db = connect(args.db)
+    for path in args.dumps:
+        start = time.perf_counter()
+        result = ingest(db, path, args.force)
+        elapsed = time.perf_counter() - start
+        if result is None:
+            print(f"{path}: already ingested, skipped")
+            continue
+        items, added = result
+        print(f"{path}: {items:,} items, {added:,} new media in {elapsed:.2f} s "
+              f"({items / elapsed if elapsed else 0:,.0f} items/s)")
+
+    for shortcode in args.lookup:
+        start = time.perf_counter()
+        media = lookup(db, shortcode)
+        elapsed = time.perf_counter() - start
+        print(f"{shortcode}: {len(media)} media ({elapsed * 1000:.3f} ms)")
+        for entry in media:
+            print(f"  {entry['carousel_index'] or '-':>3} {entry['kind']:5} {entry['url'] or entry['post_url']}")
+
+    if not args.lookup:
+        print(", ".join(f"{count:,} {name}" for name, count in stats(db).items()))
+    db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Declarative layout engine for store screenshots.
+Layouts are described once in 1280x800 design units and rasterized to any size and locale.
+"""
+
+from PIL import ImageDraw
+
+import fonts
+from tracing import traced
+
+# Every layout is designed at this size; other targets are scaled from it
+DESIGN_WIDTH = 1280
+DESIGN_HEIGHT = 800
+
+def draw_rounded_rect(draw, coords, radius, fill):
+    """Draw a rounded rectangle"""
+    x1, y1, x2, y2 = coords
+    draw.rectangle([x1 + radius, y1, x2 - radius, y2], fill=fill)
+    draw.rectangle([x1, y1 + radius, x2, y2 - radius], fill=fill)
+    draw.ellipse([x1, y1, x1 + 2*radius, y1 + 2*radius], fill=fill)
+    draw.ellipse([x2 - 2*radius, y1, x2, y1 + 2*radius], fill=fill)
+    draw.ellipse([x1, y2 - 2*radius, x1 + 2*radius, y2], fill=fill)
+    draw.ellipse([x2 - 2*radius, y2 - 2*radius, x2, y2], fill=fill)
+
+class Text:
+    """A line (or lines) of text at a fixed position, or centered in a column.
+
+    With center=(x, width) each line is centered in that column; center=True uses the full canvas.
+    Multi-line text is split after translation and stacked line_height apart.
+    """
+
+    def __init__(self, text, x=0, y=0, size=20, fill=(255, 255, 255), center=None, line_height=0):
+        self.text = text
+        self.x = x
+        self.y = y
+        self.size = size
+        self.fill = fill
+        self.center = (0, DESIGN_WIDTH) if center is True else center
+        self.line_height = line_height
+
+    def moved(self, dx, dy):
+        center = (self.center[0] + dx, self.center[1]) if self.center else None
+        return Text(self.text, self.x + dx, self.y + dy, self.size, self.fill, center, self.line_height)
+
+    def draw(self, draw, scale, strings):
+        font = fonts.get_font(scale.length(self.size))
+        for j, line in enumerate(strings.get(self.text, self.text).split('\n')):
+            y = scale.length(self.y + j * self.line_height)
+            if self.center:
+                column_x, column_width = scale.length(self.center[0]), scale.length(self.center[1])
+                x = column_x + (column_width - fonts.text_width(line, font)) // 2
+            else:
+                x = scale.length(self.x)
+            draw.text((x, y), line, fill=self.fill, font=font)
+
+class RoundedRect:
+    """A filled rectangle with rounded corners."""
+
+    def __init__(self, box, radius, fill):
+        self.box = box
+        self.radius = radius
+        self.fill = fill
+
+    def moved(self, dx, dy):
+        x1, y1, x2, y2 = self.box
+        return RoundedRect((x1 + dx, y1 + dy, x2 + dx, y2 + dy), self.radius, self.fill)
+
+    def draw(self, draw, scale, strings):
+        draw_rounded_rect(draw, scale.box(self.box), scale.length(self.radius), self.fill)
+
+class Circle:
+    """A filled ellipse inside a bounding box."""
+
+    def __init__(self, box, fill):
+        self.box = box
+        self.fill = fill
+
+    def moved(self, dx, dy):
+        x1, y1, x2, y2 = self.box
+        return Circle((x1 + dx, y1 + dy, x2 + dx, y2 + dy), self.fill)
+
+    def draw(self, draw, scale, strings):
+        draw.ellipse(list(scale.box(self.box)), fill=self.fill)
+
+class Grid:
+    """A grid of cells; cell(index) returns the elements of one cell in cell-relative coordinates.
+
+    Cells whose right edge would pass max_right are skipped and do not consume an index.
+    """
+
+    def __init__(self, origin, rows, cols, cell_size, gap, cell, max_right=None):
+        self.origin = origin
+        self.rows = rows
+        self.cols = cols
+        self.cell_size = cell_size if isinstance(cell_size, tuple) else (cell_size, cell_size)
+        self.gap = gap if isinstance(gap, tuple) else (gap, gap)
+        self.cell = cell
+        self.max_right = max_right
+
+    def expand(self):
+        """Return the grid's elements in absolute design coordinates."""
+        elements = []
+        index = 0
+        for row in range(self.rows):
+            for col in range(self.cols):
+                x = self.origin[0] + col * (self.cell_size[0] + self.gap[0])
+                y = self.origin[1] + row * (self.cell_size[1] + self.gap[1])
+                if self.max_right is not None and x + self.cell_size[0] > self.max_right:
+                    continue
+                elements.extend(element.moved(x, y) for element in self.cell(index))
+                index += 1
+        return elements
+
+class Scale:
+    """Maps design units to target pixels."""
+
+    def __init__(self, width, height):
+        self.factor = width / DESIGN_WIDTH
+        if height != round(DESIGN_HEIGHT * self.factor):
+            raise ValueError(f"{width}x{height} does not have the {DESIGN_WIDTH}x{DESIGN_HEIGHT} aspect ratio")
+
+    def length(self, value):
+        # At 1x this returns the design value unchanged
+        return int(round(value * self.factor))
+
+    def box(self, box):
+        return tuple(self.length(value) for value in box)
+
+def compile_layout(elements):
+    """Flatten a layout (expanding grids) into a display list. Done once per layout."""
+    display_list = []
+    for element in elements:
+        if isinstance(element, Grid):
+            display_list.extend(compile_layout(element.expand()))
+        else:
+            display_list.append(element)
+    return display_list
+
+@traced
+def rasterize(display_list, size, background, strings=None):
+    """Draw a compiled layout at size=(width, height). background(width, height) returns the base image."""
+    width, height = size
+    scale = Scale(width, height)
+    img = background(width, height)
+    draw = ImageDraw.Draw(img)
+    for element in display_list:
+        element.draw(draw, scale, strings or {})
+    return img
+
+@traced
+def render_batch(layouts, sizes, locales, background):
+    """Rasterize every layout at every size and locale in one pass.
+
+    layouts maps name -> elements and locales maps locale -> {source text: translation}.
+    Fonts, backgrounds and text measurements are shared across all variants.
+    Returns {(name, (width, height), locale): image}.
+    """
+    compiled = {name: compile_layout(elements) for name, elements in layouts.items()}
+    images = {}
+    for name, display_list in compiled.items():
+        for size in sizes:
+            for locale, strings in locales.items():
+                images[(name, tuple(size), locale)] = rasterize(display_list, size, background, strings)
+    return images
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Shared cache for the L-mode geometry masks used by the icon generators.
+Rounded corners, the white circle and the photo ellipse are rendered once per geometry.
+"""
+
+from PIL import Image, ImageDraw
+from collections import OrderedDict
+
+# Default memory budget for cached masks (L mode = 1 byte per pixel)
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+class MaskCache:
+    """Memory-bounded LRU cache of masks with hit/miss counters."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._masks = OrderedDict()
+        self._bytes = 0
+
+    def get(self, key, factory):
+        """Return the cached mask for key, rendering it with factory() on a miss."""
+        mask = self._masks.get(key)
+        if mask is not None:
+            self.hits += 1
+            self._masks.move_to_end(key)
+            return mask
+
+        self.misses += 1
+        mask = factory()
+        size = mask.size[0] * mask.size[1] * len(mask.getbands())
+        if size > self.max_bytes:
+            # Too big to ever fit, hand it out without caching
+            return mask
+
+        self._masks[key] = mask
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, evicted = self._masks.popitem(last=False)
+            self._bytes -= evicted.size[0] * evicted.size[1] * len(evicted.getbands())
+        return mask
+
+    def clear(self):
+        """Drop every cached mask and reset the counters."""
+        self._masks.clear()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """Return hit/miss counters and current usage."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._masks),
+            "bytes": self._bytes,
+        }
+
+# Process-wide cache used by the generators
+MASK_CACHE = MaskCache()
+
+def _render(size, supersample, draw_shape):
+    """Draw a shape on a (optionally supersampled) mask and shrink it to size."""
+    scaled = size * supersample
+    mask = Image.new('L', (scaled, scaled), 0)
+    draw_shape(ImageDraw.Draw(mask), supersample)
+    if supersample > 1:
+        # Averaging the supersampled mask gives anti-aliased edges
+        mask = mask.reduce(supersample)
+    return mask
+
+def rounded_rect_mask(size, radius, supersample=1):
+    """Return a cached size x size mask of a rounded rectangle. Treat it as read-only."""
+    def draw_shape(draw, scale):
+        draw.rounded_rectangle([(0, 0), (size * scale - 1, size * scale - 1)], radius=radius * scale, fill=255)
+
+    return MASK_CACHE.get(("rounded", size, radius, supersample),
+                          lambda: _render(size, supersample, draw_shape))
+
+def ellipse_mask(size, margin, supersample=1):
+    """Return a cached size x size mask of a circle inset by margin. Treat it as read-only."""
+    def draw_shape(draw, scale):
+        draw.ellipse([margin * scale, margin * scale, (size - margin) * scale, (size - margin) * scale], fill=255)
+
+    return MASK_CACHE.get(("ellipse", size, margin, supersample),
+                          lambda: _render(size, supersample, draw_shape))
+
+def mask_cache_stats():
+    """Return the hit/miss counters of the shared mask cache."""
+    return MASK_CACHE.stats()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Lossless PNG size optimizer for the generated icons and screenshots.
+Tries color-type reduction (including exact palettes), PNG row filters and zlib strategies per file,
+keeps the smallest encoding that decodes to the same pixels, and runs across files in a process pool.
+"""
+
+from PIL import Image
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import glob
+import io
+import os
+import struct
+import zlib
+
+from backends import np
+from buildcache import BuildCache, file_digest
+from pngcodec import FILTER_NAMES, PNG_SIGNATURE, filter_rows, png_chunk
+import backends
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PATTERNS = [
+    os.path.join(SCRIPT_DIR, "assets", "icons", "*.png"),
+    os.path.join(SCRIPT_DIR, "assets", "screenshots", "*.png"),
+]
+# Inputs of other targets: rewriting them would change every key built from them
+EXCLUDED_NAMES = {"icon-source.png"}
+
+# PNG color types
+GRAY, RGB, PALETTE, GRAY_ALPHA, RGBA = 0, 2, 3, 4, 6
+
+# How many screened (color type, filter) candidates have every zlib strategy tried, and how many of
+# the resulting (candidate, strategy) pairs are compressed again at the slow high levels
+SEARCH_WIDTH = 3
+LEVEL_SEARCH_WIDTH = 2
+
+# zlib level of the screening pass; it only has to rank the candidates
+SCREEN_LEVEL = 3
+
+STRATEGIES = {
+    "default": zlib.Z_DEFAULT_STRATEGY,
+    "filtered": zlib.Z_FILTERED,
+    "rle": zlib.Z_RLE,
+}
+
+def color_candidates(img):
+    """Return every lossless (color_type, bit_depth, rows, palette, transparency) representation of img."""
+    rgba = np.asarray(img.convert("RGBA"))
+    height, width = rgba.shape[:2]
+    opaque = bool((rgba[..., 3] == 255).all())
+    gray = bool(((rgba[..., 0] == rgba[..., 1]) & (rgba[..., 1] == rgba[..., 2])).all())
+
+    # A constant alpha channel or repeated gray samples only add bytes, so each image gets its
+    # narrowest direct color type
+    if gray and opaque:
+        candidates = [(GRAY, 8, np.ascontiguousarray(rgba[..., 0]), None, None)]
+    elif gray:
+        candidates = [(GRAY_ALPHA, 8, np.ascontiguousarray(rgba[..., [0, 3]]).reshape(height, width * 2), None, None)]
+    elif opaque:
+        candidates = [(RGB, 8, np.ascontiguousarray(rgba[..., :3]).reshape(height, width * 3), None, None)]
+    else:
+        candidates = [(RGBA, 8, rgba.reshape(height, width * 4), None, None)]
+
+    # An exact palette only when the image has at most 256 distinct RGBA colors
+    packed = rgba.view(np.uint32).reshape(height, width)
+    colors, indices = np.unique(packed, return_inverse=True)
+    if len(colors) <= 256:
+        entries = colors.view(np.uint8).reshape(-1, 4)
+        # Put transparent entries first so tRNS can stay short
+        order = np.argsort(entries[:, 3] == 255, kind="stable")
+        remap = np.empty_like(order)
+        remap[order] = np.arange(len(order))
+        entries = entries[order]
+        indices = remap[indices.reshape(height, width)].astype(np.uint8)
+
+        bit_depth = next(depth for depth in (1, 2, 4, 8) if len(colors) <= 1 << depth)
+        alphas = entries[:, 3]
+        translucent = int((alphas < 255).sum())
+        transparency = alphas[:translucent].tobytes() if translucent else None
+        candidates.append((PALETTE, bit_depth, _pack_bits(indices, bit_depth), entries[:, :3].tobytes(),
+                           transparency))
+
+    return candidates
+
+def _pack_bits(values, bit_depth):
+    """Pack 8-bit samples into rows of 1/2/4-bit samples, most significant bits first."""
+    if bit_depth == 8:
+        return values
+    per_byte = 8 // bit_depth
+    height, width = values.shape
+    padded = np.zeros((height, -(-width // per_byte) * per_byte), dtype=np.uint8)
+    padded[:, :width] = values
+    groups = padded.reshape(height, -1, per_byte)
+    packed = np.zeros(groups.shape[:2], dtype=np.uint8)
+    for i in range(per_byte):
+        packed |= groups[:, :, i] << (8 - bit_depth * (i + 1))
+    return packed
+
+def _container(width, height, color_type, bit_depth, palette, transparency, idat):
+    """Wrap compressed image data as a minimal PNG (IHDR, PLTE, tRNS, IDAT, IEND)."""
+    png = PNG_SIGNATURE + png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, bit_depth, color_type, 0, 0, 0))
+    if palette is not None:
+        png += png_chunk(b"PLTE", palette)
+    if transparency:
+        png += png_chunk(b"tRNS", transparency)
+    return png + png_chunk(b"IDAT", idat) + png_chunk(b"IEND", b"")
+
+def _deflate(data, level, strategy):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 15, 9, strategy)
+    return compressor.compress(data) + compressor.flush()
+
+def _bytes_per_pixel(color_type, bit_depth):
+    channels = {GRAY: 1, RGB: 3, PALETTE: 1, GRAY_ALPHA: 2, RGBA: 4}[color_type]
+    return max(1, channels * bit_depth // 8)
+
+def encode(width, height, color_type, bit_depth, rows, palette, transparency, method, level, strategy):
+    """Encode one candidate as a minimal PNG (IHDR, PLTE, tRNS, IDAT, IEND)."""
+    filtered = filter_rows(rows, _bytes_per_pixel(color_type, bit_depth), method)
+    return _container(width, height, color_type, bit_depth, palette, transparency,
+                      _deflate(filtered, level, strategy))
+
+def optimize_image(img, levels=(9,)):
+    """Return (best PNG bytes, description) for img, trying every lossless candidate."""
+    width, height = img.size
+    reference = np.asarray(img.convert("RGBA"))
+
+    # Pillow's own optimizer is always a candidate
+    buffer = io.BytesIO()
+    img.save(buffer, "PNG", optimize=True)
+    best, best_label = buffer.getvalue(), "pillow optimize"
+
+    # Screen every color type x filter with a quick zlib pass. Each candidate is filtered once and
+    # its scanlines reused by every later pass
+    screened = []
+    for color_type, bit_depth, rows, palette, transparency in color_candidates(img):
+        header = (width, height, color_type, bit_depth, palette, transparency)
+        overhead = len(_container(*header, b""))
+        methods = ["none"] if color_type == PALETTE and bit_depth < 8 else FILTER_NAMES
+        for method in methods:
+            filtered = filter_rows(rows, _bytes_per_pixel(color_type, bit_depth), method)
+            size = overhead + len(_deflate(filtered, SCREEN_LEVEL, zlib.Z_DEFAULT_STRATEGY))
+            screened.append((size, len(screened), header, method, filtered))
+    screened.sort(key=lambda entry: entry[:2])
+
+    # Try every strategy on the most promising few at level 6 (levels up to 3 skip the lazy matching
+    # the strategies tune), and spend the slow high levels only on the best of those pairs
+    trials = []
+    for _, _, header, method, filtered in screened[:SEARCH_WIDTH]:
+        for strategy_name, strategy in STRATEGIES.items():
+            size = len(_container(*header, _deflate(filtered, 6, strategy)))
+            trials.append((size, len(trials), header, method, filtered, strategy_name))
+    trials.sort(key=lambda entry: entry[:2])
+
+    for _, _, header, method, filtered, strategy_name in trials[:LEVEL_SEARCH_WIDTH]:
+        for level in levels:
+            data = _container(*header, _deflate(filtered, level, STRATEGIES[strategy_name]))
+            if len(data) < len(best):
+                best = data
+                best_label = f"type {header[2]}/{header[3]}-bit, {method} filter, zlib {level} {strategy_name}"
+
+    # Never keep an encoding that does not round-trip to the same pixels
+    decoded = np.asarray(Image.open(io.BytesIO(best)).convert("RGBA"))
+    if not np.array_equal(decoded, reference):
+        raise ValueError(f"optimized encoding changed pixels ({best_label})")
+    return best, best_label
+
+def optimize_file(path, levels=(9,), dry_run=False):
+    """Optimize one PNG in place if a smaller lossless encoding exists. Returns (path, before, after, label)."""
+    with open(path, 'rb') as f:
+        original = f.read()
+    img = Image.open(io.BytesIO(original))
+    img.load()
+    data, label = optimize_image(img, levels)
+
+    if len(data) >= len(original):
+        return path, len(original), len(original), "already optimal"
+    if not dry_run:
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return path, len(original), len(data), label
+
+def optimize_files(paths, jobs=None, levels=(9,), dry_run=False):
+    """Optimize many PNGs across a process pool. Returns results in input order."""
+    paths = list(paths)
+    if jobs == 1 or len(paths) <= 1:
+        return [optimize_file(path, levels, dry_run) for path in paths]
+    with ProcessPoolExecutor(jobs) as pool:
+        return list(pool.map(optimize_file, paths, [levels] * len(paths), [dry_run] * len(paths)))
+
+def default_paths():
+    """The generated PNGs matched by DEFAULT_PATTERNS, minus the ones other targets are built from."""
+    return sorted(path for pattern in DEFAULT_PATTERNS for path in glob.glob(pattern)
+                  if os.path.basename(path) not in EXCLUDED_NAMES)
+
+def refresh_manifest(results, digests, cache=None):
+    """Point build-manifest entries at the rewritten files, so fresh targets stay fresh. Returns the count."""
+    cache = cache or BuildCache()
+    refreshed = sum(cache.refresh(path, digests[path]) for path, before, after, _ in results if after < before)
+    if refreshed:
+        cache.save()
+    return refreshed
+
+def print_report(results, root=SCRIPT_DIR):
+    """Print per-asset and total byte savings."""
+    total_before = total_after = 0
+    for path, before, after, label in results:
+        total_before += before
+        total_after += after
+        saved = before - after
+        print(f"  {os.path.relpath(path, root):45} {before:9,} -> {after:9,} bytes "
+              f"({saved / before * 100 if before else 0:5.1f}% saved)  {label}")
+    saved = total_before - total_after
+    print(f"Total: {total_before:,} -> {total_after:,} bytes, saved {saved:,} "
+          f"({saved / total_before * 100 if total_before else 0:.1f}%)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Losslessly shrink the generated PNG assets.")
+    parser.add_argument("paths", nargs="*",
+                        help="PNG files (default: assets/icons except icon-source.png, and assets/screenshots)")
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("--exhaustive", action="store_true", help="also try zlib levels 6-8")
+    parser.add_argument("--dry-run", action="store_true", help="report savings without rewriting files")
+    args = parser.parse_args()
+    backends.require_numpy("PNG optimization")
+
+    paths = args.paths or default_paths()
+    levels = (6, 7, 8, 9) if args.exhaustive else (9,)
+    # The pixels do not change, so outputs the build cache knew stay cache hits under their new digest
+    digests = {path: file_digest(path) for path in paths}
+    results = optimize_files(paths, args.jobs, levels, args.dry_run)
+    print_report(results)
+    if not args.dry_run:
+        refreshed = refresh_manifest(results, digests)
+        if refreshed:
+            print(f"Updated {refreshed} build manifest entries")
+
+if __name__ == "__main__":
+    main()
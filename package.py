@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Package the extension into a deterministic zip.
+The file set is discovered from manifest.json and everything its pages and scripts reference,
+entries are sorted with fixed timestamps, and compressed entries are reused for unchanged files.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+import struct
+import time
+import zlib
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ZIP_NAME = "instagram-saved-media-exporter.zip"
+DIST_DIR = "dist"
+# Compressed entries, keyed by content hash and compression level
+ENTRY_CACHE_DIR = os.path.join(SCRIPT_DIR, ".cache", "package-entries")
+
+# Shipped although nothing in the extension links to them
+EXTRA_FILES = ["privacy-policy.html"]
+
+COMPRESS_LEVEL = 9
+# Stored instead of deflated unless deflate saves at least this fraction (PNGs are already compressed)
+MIN_DEFLATE_SAVING = 0.02
+# 1980-01-01 00:00:00, the earliest DOS timestamp, for every entry
+ZIP_DATE, ZIP_TIME = (0 << 9) | (1 << 5) | 1, 0
+
+# References to other extension files in pages, stylesheets and scripts
+HTML_REFERENCE = re.compile(r"""\b(?:src|href)\s*=\s*["']([^"'#?]+)""", re.IGNORECASE)
+CSS_REFERENCE = re.compile(r"""url\(\s*["']?([^"')#?]+)""")
+JS_REFERENCE = re.compile(r"""(?:getURL|importScripts|new\s+(?:Shared)?Worker)\(\s*["']([^"']+)["']""")
+JS_FILES_LIST = re.compile(r"""\bfiles\s*:\s*\[([^\]]*)\]""")
+STRING = re.compile(r"""["']([^"']+)["']""")
+
+def _is_local(ref):
+    return not re.match(r"^(?:[a-z][a-z0-9+.-]*:|//|#)", ref, re.IGNORECASE)
+
+def _manifest_references(manifest):
+    """Every file path manifest.json names directly."""
+    refs = []
+    refs.extend(manifest.get("icons", {}).values())
+    action = manifest.get("action") or manifest.get("browser_action") or {}
+    icon = action.get("default_icon", {})
+    refs.extend(icon.values() if isinstance(icon, dict) else [icon])
+    refs.append(action.get("default_popup"))
+    background = manifest.get("background", {})
+    refs.append(background.get("service_worker"))
+    refs.extend(background.get("scripts", []))
+    refs.append(background.get("page"))
+    for script in manifest.get("content_scripts", []):
+        refs.extend(script.get("js", []))
+        refs.extend(script.get("css", []))
+    for resource in manifest.get("web_accessible_resources", []):
+        refs.extend(resource.get("resources", []) if isinstance(resource, dict) else [resource])
+    refs.append(manifest.get("options_page"))
+    refs.append(manifest.get("options_ui", {}).get("page"))
+    refs.append(manifest.get("devtools_page"))
+    refs.append(manifest.get("side_panel", {}).get("default_path"))
+    refs.extend(manifest.get("chrome_url_overrides", {}).values())
+    return [ref for ref in refs if ref]
+
+def _file_references(path):
+    """Paths referenced from one HTML, CSS or JS file, relative to the extension root."""
+    with open(os.path.join(SCRIPT_DIR, path), encoding="utf-8", errors="replace") as f:
+        text = f.read()
+    ext = os.path.splitext(path)[1].lower()
+    refs = []
+    if ext in (".html", ".htm"):
+        refs.extend(HTML_REFERENCE.findall(text))
+        refs.extend(CSS_REFERENCE.findall(text))
+        base = os.path.dirname(path)
+    elif ext == ".css":
+        refs.extend(CSS_REFERENCE.findall(text))
+        base = os.path.dirname(path)
+    elif ext == ".js":
+        refs.extend(JS_REFERENCE.findall(text))
+        for files in JS_FILES_LIST.findall(text):
+            refs.extend(STRING.findall(files))
+        # getURL and the scripting API resolve against the extension root
+        base = ""
+    else:
+        return []
+    return [os.path.normpath(os.path.join(base, ref.lstrip("/") if ref.startswith("/") else ref))
+            for ref in refs if _is_local(ref)]
+
+def discover_files(manifest_path="manifest.json"):
+    """Return (sorted file list, missing references) for everything the extension loads."""
+    with open(os.path.join(SCRIPT_DIR, manifest_path)) as f:
+        manifest = json.load(f)
+
+    pending = [manifest_path] + _manifest_references(manifest) + EXTRA_FILES
+    if manifest.get("default_locale"):
+        pending.extend(glob.glob("_locales/*/messages.json", root_dir=SCRIPT_DIR))
+
+    files, missing = set(), set()
+    while pending:
+        ref = os.path.normpath(pending.pop())
+        if ref in files or ref in missing:
+            continue
+        matches = glob.glob(ref, root_dir=SCRIPT_DIR) if glob.has_magic(ref) else [ref]
+        for path in matches:
+            if not os.path.isfile(os.path.join(SCRIPT_DIR, path)):
+                if ref not in EXTRA_FILES:
+                    missing.add(path)
+                continue
+            files.add(path)
+            pending.extend(_file_references(path))
+    return sorted(path.replace(os.sep, "/") for path in files), sorted(missing)
+
+def unreferenced_sources(files):
+    """Top-level scripts, styles and pages that nothing references (left out of the package)."""
+    candidates = [name for name in os.listdir(SCRIPT_DIR) if name.endswith((".js", ".css", ".html"))]
+    return sorted(name for name in candidates if name not in files and name != "index.html")
+
+def compress_entry(data, level=COMPRESS_LEVEL):
+    """Return (method, crc32, compressed bytes) for one file, reusing the on-disk entry cache."""
+    digest = hashlib.sha256(data).hexdigest()
+    path = os.path.join(ENTRY_CACHE_DIR, f"{digest}-{level}")
+    crc = zlib.crc32(data)
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            blob = f.read()
+        return blob[0], crc, blob[1:]
+
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    deflated = compressor.compress(data) + compressor.flush()
+    if len(deflated) <= len(data) * (1 - MIN_DEFLATE_SAVING):
+        method, payload = 8, deflated
+    else:
+        method, payload = 0, data
+
+    os.makedirs(ENTRY_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{id(data)}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(bytes([method]) + payload)
+    os.replace(tmp_path, path)
+    return method, crc, payload
+
+def write_zip(zip_path, entries):
+    """Write [(name, size, method, crc, payload)] as a zip with fixed metadata, in the given order."""
+    central = []
+    tmp_path = f"{zip_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        for name, size, method, crc, payload in entries:
+            encoded = name.encode("utf-8")
+            offset = f.tell()
+            # Local file header: version 2.0, UTF-8 names, fixed date, no extra field
+            f.write(struct.pack("<IHHHHHIIIHH", 0x04034b50, 20, 0x0800, method, ZIP_TIME, ZIP_DATE,
+                                crc, len(payload), size, len(encoded), 0))
+            f.write(encoded)
+            f.write(payload)
+            central.append(struct.pack("<IHHHHHHIIIHHHHHII", 0x02014b50, (3 << 8) | 20, 20, 0x0800, method,
+                                       ZIP_TIME, ZIP_DATE, crc, len(payload), size, len(encoded), 0, 0, 0, 0,
+                                       (0o100644 << 16), offset) + encoded)
+        start = f.tell()
+        directory = b"".join(central)
+        f.write(directory)
+        f.write(struct.pack("<IHHHHIIH", 0x06054b50, 0, 0, len(entries), len(entries), len(directory), start, 0))
+    os.replace(tmp_path, zip_path)
+
+def sync_dist(files, dist_dir):
+    """Mirror the packaged files into dist_dir (for loading unpacked), copying only changed files."""
+    wanted = set(files)
+    for root, _, names in os.walk(dist_dir, topdown=False):
+        for name in names:
+            path = os.path.join(root, name)
+            if os.path.relpath(path, dist_dir).replace(os.sep, "/") not in wanted:
+                os.remove(path)
+        if root != dist_dir and not os.listdir(root):
+            os.rmdir(root)
+    for name in files:
+        source, target = os.path.join(SCRIPT_DIR, name), os.path.join(dist_dir, name)
+        if os.path.exists(target):
+            stat_s, stat_t = os.stat(source), os.stat(target)
+            if stat_s.st_size == stat_t.st_size and stat_s.st_mtime_ns == stat_t.st_mtime_ns:
+                continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copy2(source, target)
+
+def package(zip_path, jobs=None, level=COMPRESS_LEVEL):
+    """Build the zip. Returns (files, missing references, reused entry count)."""
+    files, missing = discover_files()
+    if missing:
+        raise FileNotFoundError("referenced but missing: " + ", ".join(missing))
+
+    contents = []
+    for name in files:
+        with open(os.path.join(SCRIPT_DIR, name), 'rb') as f:
+            contents.append(f.read())
+    cached = sum(1 for data in contents
+                 if os.path.exists(os.path.join(ENTRY_CACHE_DIR, f"{hashlib.sha256(data).hexdigest()}-{level}")))
+
+    # zlib releases the GIL, so threads compress changed files in parallel
+    with ThreadPoolExecutor(jobs) as pool:
+        compressed = list(pool.map(lambda data: compress_entry(data, level), contents))
+
+    write_zip(zip_path, [(name, len(data), method, crc, payload)
+                         for name, data, (method, crc, payload) in zip(files, contents, compressed)])
+    return files, missing, cached
+
+def main():
+    parser = argparse.ArgumentParser(description="Package the extension into a reproducible zip.")
+    parser.add_argument("--output", default=ZIP_NAME, help="zip file to write")
+    parser.add_argument("--dist", default=DIST_DIR, help="also mirror the files here ('' to skip)")
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count() or 1, help="compression threads")
+    parser.add_argument("--list", action="store_true", help="only print the discovered file set")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.list:
+        files, missing = discover_files()
+        print("\n".join(files))
+        for path in missing:
+            print(f"MISSING {path}")
+        return
+
+    files, _, reused = package(args.output, args.jobs)
+    if args.dist:
+        sync_dist(files, args.dist)
+    elapsed = time.perf_counter() - start
+
+    for name in files:
+        print(f"  {name}")
+    for name in unreferenced_sources(files):
+        print(f"Not packaged (nothing references it): {name}")
+    with open(args.output, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    print(f"\nBuild complete: {args.output} ({os.path.getsize(args.output):,} bytes, {len(files)} files, "
+          f"{reused} reused) in {elapsed * 1000:.0f} ms")
+    print(f"sha256 {digest}")
+
+if __name__ == "__main__":
+    main()
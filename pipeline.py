@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Run the asset generators as one dependency graph.
+Independent targets (each icon size, each screenshot) are built concurrently in a process pool.
+
+    clean-source -> icon-16, icon-32, icon-48, icon-128, icon-512 -> icon-pack
+    screenshot-1 .. screenshot-4 (independent)
+"""
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import argparse
+import os
+import time
+
+from buildcache import BuildCache
+import convert_icons
+import create_clean_icons
+import create_icons
+import create_screenshots
+import icon_pack
+import tiles
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ICONS_DIR = os.path.join(SCRIPT_DIR, "assets", "icons")
+SCREENSHOTS_DIR = os.path.join(SCRIPT_DIR, "assets", "screenshots")
+SOURCE_PATH = os.path.join(ICONS_DIR, "icon-source.png")
+
+class Target:
+    """One node of the asset graph: a picklable build function, its output and its dependencies."""
+
+    def __init__(self, name, output, func, args=(), deps=(), key=None):
+        self.name = name
+        self.output = output
+        self.func = func
+        self.args = args
+        self.deps = list(deps)
+        # Called once the dependencies are built, since their outputs feed the key
+        self.key = key
+
+# Build functions run inside worker processes, so they live at module level
+
+def build_clean_source(output_path, inpaint):
+    if tiles.is_large(create_clean_icons.INPUT_IMAGE):
+        create_clean_icons.remove_watermark_tiled(create_clean_icons.INPUT_IMAGE, output_path, inpaint)
+    else:
+        img = create_clean_icons.Image.open(create_clean_icons.INPUT_IMAGE)
+        create_clean_icons.remove_watermark(img, inpaint=inpaint).save(output_path, "PNG")
+    print(f"Created {output_path} (cleaned source)")
+
+def build_icon(source_path, output_path, size, antialias):
+    create_icons.create_icon_with_photo(source_path, output_path, size, create_icons.GRADIENT_COLOR1,
+                                        create_icons.GRADIENT_COLOR2, antialias)
+
+def build_recolored_icon(input_path, output_path):
+    convert_icons.convert_file(input_path, output_path)
+    print(f"Created {output_path} (recolored)")
+
+def build_icon_pack(icons_dir, output_dir):
+    for path in icon_pack.build_pack(icons_dir, output_dir):
+        print(f"Created {path}")
+
+def build_screenshot(name, output_path):
+    create_screenshots.render_screenshot(name).save(output_path, "PNG")
+    print(f"Created {output_path}")
+
+def asset_graph(inpaint=False, antialias=1, recolor=False):
+    """Declare every asset target and its dependencies."""
+    targets = []
+    icon_sizes = create_icons.ICON_SIZES
+    all_sizes = sorted(icon_sizes + [create_icons.SOURCE_SIZE])
+
+    # The watermark-free master only exists on machines with the original artwork
+    source_deps = []
+    if os.path.exists(create_clean_icons.INPUT_IMAGE):
+        targets.append(Target("clean-source", SOURCE_PATH, build_clean_source, (SOURCE_PATH, inpaint),
+                              key=lambda: create_clean_icons.clean_target_key(SOURCE_PATH, inpaint)))
+        source_deps = ["clean-source"]
+
+    for size in all_sizes:
+        output = os.path.join(ICONS_DIR, f"icon-{size}.png")
+        if recolor and size in icon_sizes:
+            input_path = os.path.join(SCRIPT_DIR, convert_icons.X_ICONS_DIR, f"icon-{size}.png")
+            targets.append(Target(f"icon-{size}", output, build_recolored_icon, (input_path, output),
+                                  key=lambda path=input_path: convert_icons.recolor_target_key(path)))
+        else:
+            targets.append(Target(
+                f"icon-{size}", output, build_icon, (SOURCE_PATH, output, size, antialias), source_deps,
+                key=lambda size=size: create_icons.icon_target_key(SOURCE_PATH, size, all_sizes, antialias=antialias)))
+
+    # Atlas, favicon.ico and favicon PNGs, cut from the sizes rendered above
+    output = os.path.join(icon_pack.DEFAULT_OUTPUT_DIR, icon_pack.ATLAS_JSON_NAME)
+    targets.append(Target("icon-pack", output, build_icon_pack, (ICONS_DIR, icon_pack.DEFAULT_OUTPUT_DIR),
+                          [f"icon-{s}" for s in all_sizes], key=lambda: icon_pack.pack_target_key(ICONS_DIR)))
+
+    for index, name in enumerate(create_screenshots.LAYOUTS, 1):
+        output = os.path.join(SCREENSHOTS_DIR, f"{name}.png")
+        targets.append(Target(f"screenshot-{index}", output, build_screenshot, (name, output),
+                              key=lambda name=name: create_screenshots.screenshot_target_key(name)))
+
+    return targets
+
+def run_graph(targets, jobs=1, cache=None):
+    """Build targets in dependency order, running up to `jobs` ready targets at once.
+
+    With jobs=1 everything runs in this process in declaration order, which is the serial reference.
+    Returns {target name: "hit" | "built"}.
+    """
+    by_name = {target.name: target for target in targets}
+    for target in targets:
+        missing = [dep for dep in target.deps if dep not in by_name]
+        if missing:
+            raise ValueError(f"{target.name} depends on unknown targets: {', '.join(missing)}")
+
+    status = {}
+    pending = list(targets)
+    running = {}
+    keys = {}
+    pool = ProcessPoolExecutor(jobs) if jobs > 1 else None
+
+    try:
+        while pending or running:
+            # Start every target whose dependencies are finished
+            for target in [t for t in pending if all(dep in status for dep in t.deps)]:
+                pending.remove(target)
+                os.makedirs(os.path.dirname(target.output), exist_ok=True)
+                keys[target.name] = target.key() if target.key else None
+                if cache and keys[target.name] and cache.is_fresh(target.output, keys[target.name]):
+                    status[target.name] = "hit"
+                    continue
+                if pool:
+                    running[pool.submit(target.func, *target.args)] = target
+                else:
+                    target.func(*target.args)
+                    _finish(target, keys, status, cache)
+
+            if not running:
+                if pending and not any(all(dep in status for dep in t.deps) for t in pending):
+                    raise ValueError("Dependency cycle between: " + ", ".join(t.name for t in pending))
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                target = running.pop(future)
+                future.result()
+                _finish(target, keys, status, cache)
+    finally:
+        if pool:
+            pool.shutdown()
+
+    return status
+
+def _finish(target, keys, status, cache):
+    """Record a freshly built target; only the parent process ever writes the manifest."""
+    if cache and keys[target.name]:
+        cache.record(target.output, keys[target.name])
+    status[target.name] = "built"
+
+def main():
+    parser = argparse.ArgumentParser(description="Build every icon and screenshot as one dependency graph.")
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count() or 1,
+                        help="number of worker processes (1 = serial, in-process)")
+    parser.add_argument("--force", action="store_true", help="ignore the build cache")
+    parser.add_argument("--inpaint", action="store_true", help="inpaint the watermark when cleaning the source")
+    parser.add_argument("--antialias", type=int, default=1, metavar="N", help="supersample icon masks N times")
+    parser.add_argument("--recolor", action="store_true",
+                        help="produce icon-16..128 by recoloring the X extension icons instead of rendering")
+    args = parser.parse_args()
+
+    cache = BuildCache(force=args.force)
+    start = time.perf_counter()
+    status = run_graph(asset_graph(args.inpaint, args.antialias, args.recolor), args.jobs, cache)
+    elapsed = time.perf_counter() - start
+    cache.save()
+
+    for name, result in status.items():
+        print(f"  [{result:5}] {name}")
+    built = sum(1 for result in status.values() if result == "built")
+    print(f"\nBuilt {built} of {len(status)} targets with {args.jobs} job(s) in {elapsed * 1000:.0f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+PNG encoding primitives shared by the optimizer and the band writer: the signature, chunk framing
+and the (adaptive) row filters.
+"""
+
+import struct
+import zlib
+
+from backends import np
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+FILTER_NAMES = ["none", "sub", "up", "average", "paeth", "adaptive"]
+
+def png_chunk(tag, data):
+    """Frame data as a PNG chunk: length, tag, data and CRC."""
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+def filter_rows(rows, bpp, method):
+    """Apply a PNG filter to every row; returns the filter-type byte prefixed scanlines."""
+    x = rows.astype(np.int16)
+    a = np.zeros_like(x)
+    a[:, bpp:] = x[:, :-bpp]
+    b = np.zeros_like(x)
+    b[1:] = x[:-1]
+
+    def paeth():
+        c = np.zeros_like(x)
+        c[1:, bpp:] = x[:-1, :-bpp]
+        p = a + b - c
+        pa, pb, pc = np.abs(p - a), np.abs(p - b), np.abs(p - c)
+        return x - np.where((pa <= pb) & (pa <= pc), a, np.where(pb <= pc, b, c))
+
+    filters = [lambda: x, lambda: x - a, lambda: x - b, lambda: x - (a + b) // 2, paeth]
+
+    if method == "adaptive":
+        # libpng's heuristic: per row, the filter with the smallest sum of absolute signed residuals
+        filtered = np.stack([f().astype(np.uint8) for f in filters])
+        choice = np.abs(filtered.view(np.int8).astype(np.int32)).sum(axis=2).argmin(axis=0)
+        data = filtered[choice, np.arange(len(rows))]
+    else:
+        choice = np.full(len(rows), FILTER_NAMES.index(method))
+        data = filters[choice[0]]()
+
+    out = np.empty((len(rows), rows.shape[1] + 1), dtype=np.uint8)
+    out[:, 0] = choice
+    out[:, 1:] = data.astype(np.uint8)
+    return out.tobytes()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+In-memory library API over the asset generators.
+Each stage takes and returns Image objects; only the sink encodes and writes files, so chaining
+clean -> icons -> screenshots in one process never round-trips through PNG on disk.
+"""
+
+from PIL import Image
+import argparse
+import contextlib
+import filecmp
+import io
+import os
+import tempfile
+import time
+
+from create_clean_icons import INPUT_IMAGE, remove_watermark
+from create_icons import (GRADIENT_COLOR1, GRADIENT_COLOR2, ICON_SIZES, SOURCE_SIZE, create_icon_with_photo,
+                          render_icon_pyramid, render_icons)
+from create_screenshots import HEIGHT, LAYOUTS, WIDTH, create_gradient_bg, variant_filename
+from layout import render_batch
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ASSETS_DIR = os.path.join(SCRIPT_DIR, "assets")
+
+# Stages: Image in, Image out
+
+def clean_stage(img, inpaint=False):
+    """Remove the watermark from the original artwork."""
+    return remove_watermark(img, inpaint=inpaint)
+
+def icon_stage(source, sizes=None, colors=(GRADIENT_COLOR1, GRADIENT_COLOR2), pyramid=False, native_below=0,
+               antialias=1):
+    """Render icons from a decoded source image. Returns {size: image}."""
+    source = source.convert('RGBA')
+    sizes = sizes or ICON_SIZES + [SOURCE_SIZE]
+    if pyramid:
+        return render_icon_pyramid(source, sizes, colors[0], colors[1], native_below, antialias)
+    return render_icons(source, sizes, colors[0], colors[1], antialias)
+
+def screenshot_stage(names=None, sizes=((WIDTH, HEIGHT),), locales=None):
+    """Render screenshot layouts. Returns {(name, (width, height), locale): image}."""
+    layouts = {name: LAYOUTS[name] for name in (names or LAYOUTS)}
+    return render_batch(layouts, sizes, locales or {"en": {}}, create_gradient_bg)
+
+# Sinks: the only place images are encoded
+
+def encode_png(img, **options):
+    """Encode an image to PNG bytes in memory."""
+    buffer = io.BytesIO()
+    img.save(buffer, "PNG", **options)
+    return buffer.getvalue()
+
+def png_sink(images, **options):
+    """Encode and write {path: image}. Returns {path: bytes written}."""
+    written = {}
+    for path, img in images.items():
+        data = encode_png(img, **options)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        written[path] = len(data)
+    return written
+
+def asset_paths(icons=None, screenshots=None, assets_dir=ASSETS_DIR):
+    """Map stage results to their file names under assets/. Returns {path: image}."""
+    paths = {}
+    for size, img in (icons or {}).items():
+        paths[os.path.join(assets_dir, "icons", f"icon-{size}.png")] = img
+    for (name, size, locale), img in (screenshots or {}).items():
+        paths[os.path.join(assets_dir, "screenshots", variant_filename(name, size, locale))] = img
+    return paths
+
+def regenerate(input_path=None, assets_dir=ASSETS_DIR, inpaint=False, pyramid=False):
+    """Run clean -> icons -> screenshots in memory and write everything through one sink.
+
+    The cleaned artwork is written to icon-source.png; without original artwork the existing one is used.
+    Returns {path: bytes written}.
+    """
+    source_path = os.path.join(assets_dir, "icons", "icon-source.png")
+    paths = {}
+    if input_path and os.path.exists(input_path):
+        source = paths[source_path] = clean_stage(Image.open(input_path), inpaint)
+    else:
+        source = Image.open(source_path)
+        source.load()
+    paths.update(asset_paths(icon_stage(source, pyramid=pyramid), screenshot_stage(), assets_dir))
+    return png_sink(paths)
+
+def _regenerate_via_disk(input_path, assets_dir, inpaint=False):
+    """The script-by-script path: every stage writes PNGs and the next one decodes them again."""
+    icons_dir = os.path.join(assets_dir, "icons")
+    source_path = os.path.join(icons_dir, "icon-source.png")
+    if input_path and os.path.exists(input_path):
+        clean_stage(Image.open(input_path), inpaint).save(source_path, "PNG")
+    for size in ICON_SIZES + [SOURCE_SIZE]:
+        create_icon_with_photo(source_path, os.path.join(icons_dir, f"icon-{size}.png"), size, GRADIENT_COLOR1,
+                               GRADIENT_COLOR2)
+    for name in LAYOUTS:
+        screenshot_stage([name])[(name, (WIDTH, HEIGHT), "en")].save(
+            os.path.join(assets_dir, "screenshots", f"{name}.png"), "PNG")
+
+def compare(input_path, inpaint=False):
+    """Time a full regeneration through disk and in memory, and check both write the same files."""
+    with tempfile.TemporaryDirectory() as warm_dir, tempfile.TemporaryDirectory() as disk_dir, \
+            tempfile.TemporaryDirectory() as memory_dir:
+        for root in (warm_dir, disk_dir, memory_dir):
+            for sub in ("icons", "screenshots"):
+                os.makedirs(os.path.join(root, sub))
+            # Both runs start from the same icon-source.png when there is no original artwork
+            Image.open(os.path.join(ASSETS_DIR, "icons", "icon-source.png")).save(
+                os.path.join(root, "icons", "icon-source.png"), "PNG")
+
+        # Warm fonts, masks and backgrounds first so neither timed run pays for them
+        regenerate(input_path, warm_dir, inpaint)
+
+        start = time.perf_counter()
+        quiet = io.StringIO()
+        with contextlib.redirect_stdout(quiet):
+            _regenerate_via_disk(input_path, disk_dir, inpaint)
+        disk_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        regenerate(input_path, memory_dir, inpaint)
+        memory_time = time.perf_counter() - start
+
+        mismatched = []
+        for sub in ("icons", "screenshots"):
+            for name in sorted(os.listdir(os.path.join(disk_dir, sub))):
+                if not filecmp.cmp(os.path.join(disk_dir, sub, name), os.path.join(memory_dir, sub, name),
+                                   shallow=False):
+                    mismatched.append(f"{sub}/{name}")
+
+    print(f"  via disk:  {disk_time * 1000:7.1f} ms")
+    print(f"  in memory: {memory_time * 1000:7.1f} ms")
+    print(f"  saved:     {(disk_time - memory_time) * 1000:7.1f} ms")
+    print("  outputs identical" if not mismatched else f"  outputs differ: {', '.join(mismatched)}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Regenerate icons and screenshots in one process, in memory.")
+    parser.add_argument("--input", default=INPUT_IMAGE, help="original artwork with the watermark")
+    parser.add_argument("--inpaint", action="store_true", help="inpaint the watermark")
+    parser.add_argument("--pyramid", action="store_true", help="derive small icons from the 512px render")
+    parser.add_argument("--compare", action="store_true",
+                        help="time the disk round-trip path against the in-memory path")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(args.input, args.inpaint)
+        return
+
+    written = regenerate(args.input, ASSETS_DIR, args.inpaint, args.pyramid)
+    for path, size in written.items():
+        print(f"Created {os.path.relpath(path, SCRIPT_DIR)} ({size} bytes)")
+
+if __name__ == "__main__":
+    main()
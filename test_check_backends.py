@@ -0,0 +1,22 @@
+import pytest
+
+import backends
+import check_backends
+
+GOLDENS = check_backends.load_goldens(check_backends.GOLDEN_PATH) or {}
+
+@pytest.mark.parametrize("name, routine, render", list(check_backends.cases()),
+                         ids=[name for name, _, _ in check_backends.cases()])
+def test_backends_agree_and_match_the_goldens(name, routine, render):
+    outputs = {}
+    for backend in backends.available():
+        with backends.using(backend):
+            outputs[backend] = render()
+
+    images = list(outputs.values())
+    for image in images[1:]:
+        difference = check_backends.max_difference(images[0], image)
+        assert difference is not None and difference <= check_backends.TOLERANCES[routine]
+    # Record new cases with "python3 check_backends.py --update"
+    assert {backend: check_backends.digest(image) for backend, image in outputs.items()} == \
+        {backend: GOLDENS.get(name, {}).get(backend) for backend in outputs}
@@ -0,0 +1,39 @@
+from PIL import Image
+import os
+
+import contact_sheet
+
+def _images(directory, count):
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"{i:04}.png")
+        Image.new("RGB", (40, 30), (i % 256, 80, 160)).save(path)
+        paths.append(path)
+    return paths
+
+def test_iter_thumbnails_yields_every_path_past_the_prefetch_window(tmp_path, monkeypatch):
+    monkeypatch.setattr(contact_sheet, "THUMBNAIL_CACHE_DIR", str(tmp_path / "thumbnails"))
+    paths = _images(tmp_path, contact_sheet.PREFETCH + 6)
+
+    results = list(contact_sheet.iter_thumbnails(paths, jobs=2))
+
+    assert [path for path, _ in results] == paths
+    assert all(thumbnail for _, thumbnail in results)
+
+def test_render_mosaic_fills_every_row(tmp_path, monkeypatch):
+    monkeypatch.setattr(contact_sheet, "THUMBNAIL_CACHE_DIR", str(tmp_path / "thumbnails"))
+    paths = _images(tmp_path, contact_sheet.PREFETCH + 17)
+    output = str(tmp_path / "mosaic.png")
+
+    contact_sheet.render_mosaic(paths, output, cols=10, jobs=2)
+
+    assert Image.open(output).height == (contact_sheet.HEADER_HEIGHT + 9 * contact_sheet.row_height()
+                                         + contact_sheet.MARGIN)
+
+def test_render_pages_writes_every_page(tmp_path, monkeypatch):
+    monkeypatch.setattr(contact_sheet, "THUMBNAIL_CACHE_DIR", str(tmp_path / "thumbnails"))
+    paths = _images(tmp_path, 121)
+
+    pages = contact_sheet.render_pages(paths, str(tmp_path / "sheets"), cols=10, rows=12, jobs=2)
+
+    assert [os.path.basename(page) for page in pages] == ["sheet-001.jpg", "sheet-002.jpg"]
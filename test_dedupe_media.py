@@ -0,0 +1,26 @@
+from PIL import Image
+import os
+
+import dedupe_media
+
+SCREENSHOTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "screenshots")
+
+def test_resized_copies_are_grouped(tmp_path):
+    names = sorted(os.listdir(SCREENSHOTS_DIR))
+    paths = []
+    for name in names:
+        img = Image.open(os.path.join(SCREENSHOTS_DIR, name)).convert("RGB")
+        stem = os.path.splitext(name)[0]
+        img.save(tmp_path / f"{stem}.jpg", quality=90)
+        # The same image at another CDN size
+        img.resize((img.width * 2 // 5, img.height * 2 // 5), Image.LANCZOS).save(tmp_path / f"{stem}-small.jpg",
+                                                                                 quality=85)
+        paths += [str(tmp_path / f"{stem}.jpg"), str(tmp_path / f"{stem}-small.jpg")]
+
+    cache = dedupe_media.HashCache(str(tmp_path / "cache.json"))
+    hashes, hashed = dedupe_media.hash_files(paths, cache, jobs=1)
+    groups = dedupe_media.find_duplicates(hashes)
+
+    assert hashed == len(paths)
+    assert sorted(groups) == sorted([str(tmp_path / f"{os.path.splitext(name)[0]}.jpg"),
+                                     str(tmp_path / f"{os.path.splitext(name)[0]}-small.jpg")] for name in names)
@@ -0,0 +1,23 @@
+from PIL import Image
+import os
+
+from buildcache import BuildCache, file_digest
+import optimize_png
+
+def test_optimized_outputs_stay_fresh_in_the_build_manifest(tmp_path):
+    output = str(tmp_path / "icon-32.png")
+    Image.new("RGBA", (32, 32), (225, 48, 108, 255)).save(output, compress_level=0)
+    cache = BuildCache(str(tmp_path / "manifest.json"))
+    cache.record(output, "key")
+    cache.save()
+
+    digests = {output: file_digest(output)}
+    results = optimize_png.optimize_files([output], jobs=1)
+
+    assert results[0][2] < results[0][1]
+    assert optimize_png.refresh_manifest(results, digests, BuildCache(cache.manifest_path)) == 1
+    assert BuildCache(cache.manifest_path).is_fresh(output, "key")
+
+def test_default_paths_leave_the_icon_source_alone():
+    assert optimize_png.default_paths()
+    assert "icon-source.png" not in {os.path.basename(path) for path in optimize_png.default_paths()}
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Render the store icons in many color themes in one run, for A/B tests.
+A palette file lists the themes; the source is decoded once and the masks are built once,
+then themes are spread across worker processes, one directory per theme.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import json
+import os
+import re
+import time
+
+import convert_icons
+import create_icons
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SOURCE = os.path.join(SCRIPT_DIR, "assets", "icons", "icon-source.png")
+DEFAULT_OUTPUT_DIR = os.path.join(SCRIPT_DIR, "build", "themes")
+DEFAULT_SIZES = create_icons.ICON_SIZES + [create_icons.SOURCE_SIZE]
+DEFAULT_X_ICONS_DIR = os.path.normpath(os.path.join(SCRIPT_DIR, convert_icons.X_ICONS_DIR))
+
+# Decoded once per process; forked workers inherit them from the parent
+_source = None
+_x_icons = {}
+
+def load_themes(path):
+    """Read a palette file: {name: {"colors": [color1, color2]} or {"mapping": {...}}}.
+
+    Themes with "colors" render the gradient icon from the source. Themes with "mapping" recolor the
+    X extension icons instead; the mapping overrides fields of convert_icons.RECOLOR_MAPPING.
+    """
+    with open(path) as f:
+        themes = json.load(f)
+    for name, theme in themes.items():
+        if not re.fullmatch(r"[\w.-]+", name):
+            raise ValueError(f"theme name {name!r} is not usable as a directory name")
+        if "mapping" in theme:
+            unknown = set(theme["mapping"]) - set(convert_icons.RECOLOR_MAPPING)
+            if unknown:
+                raise ValueError(f"theme {name}: unknown mapping fields {', '.join(sorted(unknown))}")
+        elif len(theme.get("colors", ())) != 2:
+            raise ValueError(f"theme {name}: needs \"colors\": [color1, color2] or a \"mapping\"")
+    return themes
+
+def _load_inputs(source_path, sizes, x_icons_dir):
+    """Decode the icon source and the X icons once for this process."""
+    global _source
+    if _source is None:
+        _source = create_icons.load_source(source_path, max(sizes))
+    for size in sizes:
+        path = os.path.join(x_icons_dir, f"icon-{size}.png")
+        if size not in _x_icons and os.path.exists(path):
+            _x_icons[size] = create_icons.Image.open(path).convert("RGBA")
+
+def render_theme(name, theme, sizes, output_dir, supersample=1):
+    """Render every size of one theme into output_dir/name. Returns (name, icons written, seconds)."""
+    start = time.perf_counter()
+    theme_dir = os.path.join(output_dir, name)
+    os.makedirs(theme_dir, exist_ok=True)
+    if "mapping" in theme:
+        mapping = {**convert_icons.RECOLOR_MAPPING, **theme["mapping"]}
+        icons = {size: convert_icons.convert_blue_to_instagram(_x_icons[size], mapping)
+                 for size in sizes if size in _x_icons}
+    else:
+        # Every size of a theme shares one batch of gradients
+        icons = create_icons.render_icons(_source, sizes, theme["colors"][0], theme["colors"][1], supersample)
+    for size, img in icons.items():
+        img.save(os.path.join(theme_dir, f"icon-{size}.png"), "PNG")
+    return name, len(icons), time.perf_counter() - start
+
+def sweep(themes, source_path=DEFAULT_SOURCE, sizes=DEFAULT_SIZES, output_dir=DEFAULT_OUTPUT_DIR, jobs=1,
+          supersample=1, x_icons_dir=DEFAULT_X_ICONS_DIR):
+    """Render all themes x sizes. Returns [(name, icons written, seconds)] in palette order.
+
+    Recolor themes are skipped, with a warning, when there are no X icons to recolor.
+    """
+    _load_inputs(source_path, sizes, x_icons_dir)
+    recolor = [name for name, theme in themes.items() if "mapping" in theme]
+    if recolor:
+        if not _x_icons:
+            print(f"Warning: no X extension icons in {x_icons_dir}; skipping recolor theme(s) {', '.join(recolor)}")
+            themes = {name: theme for name, theme in themes.items() if name not in recolor}
+        elif missing := [size for size in sizes if size not in _x_icons]:
+            print(f"Note: no X icon at {', '.join(map(str, missing))}px; recolor themes skip those sizes")
+    # Masks depend only on geometry, so build them once here and let every theme (and fork) share them
+    create_icons.render_icons(_source, sizes, "#000000", "#000000", supersample)
+
+    if jobs == 1 or len(themes) <= 1:
+        return [render_theme(name, theme, sizes, output_dir, supersample) for name, theme in themes.items()]
+    with ProcessPoolExecutor(jobs, initializer=_load_inputs, initargs=(source_path, sizes, x_icons_dir)) as pool:
+        futures = [pool.submit(render_theme, name, theme, sizes, output_dir, supersample)
+                   for name, theme in themes.items()]
+        return [future.result() for future in futures]
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the icons in every theme of a palette file.")
+    parser.add_argument("palette", help="JSON file of {name: {\"colors\": [c1, c2]} or {\"mapping\": {...}}}")
+    parser.add_argument("--source", default=DEFAULT_SOURCE, help="icon source image")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_DIR, help="directory for per-theme subdirectories")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="comma-separated icon sizes")
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("--antialias", type=int, default=1, metavar="N", help="supersample icon masks N times")
+    parser.add_argument("--x-icons", default=DEFAULT_X_ICONS_DIR, help="X extension icons for recolor themes")
+    args = parser.parse_args()
+
+    themes = load_themes(args.palette)
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    start = time.perf_counter()
+    try:
+        results = sweep(themes, args.source, sizes, args.output, args.jobs, args.antialias, args.x_icons)
+    except FileNotFoundError as error:
+        parser.error(str(error))
+    elapsed = time.perf_counter() - start
+
+    for name, written, seconds in results:
+        print(f"  {name:24} {written:3} icons  {seconds * 1000:8.1f} ms")
+    total = sum(written for _, written, _ in results)
+    print(f"\n{total} icons in {len(results)} themes in {elapsed:.2f} s with {args.jobs} job(s) "
+          f"({total / elapsed:.0f} icons/sec) -> {os.path.relpath(args.output)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Tiled, memory-bounded image processing for very large sources.
+PNGs are decoded and encoded in horizontal bands, so the full image is never held in memory.
+Large sources can also be box-reduced band by band before the final high-quality resample.
+"""
+
+from PIL import Image
+import io
+import os
+import struct
+import zlib
+
+from backends import np
+from pngcodec import PNG_SIGNATURE, filter_rows, png_chunk
+import backends
+
+# Sources above this many pixels take the tiled paths
+LARGE_PIXELS = 4096 * 4096
+# Decoded bytes per band; peak memory is a small multiple of this, whatever the source size
+BAND_BYTES = 4 * 1024 * 1024
+# Pre-shrink with Image.reduce until the source is no smaller than REDUCE_MARGIN x the target,
+# then let LANCZOS do the rest (the same idea as Pillow's reducing_gap)
+REDUCE_MARGIN = 2
+# Input bytes filtered at once when encoding
+FILTER_BYTES = 1024 * 1024
+
+# PNG color type -> (channels, Pillow mode) for the 8-bit formats the band reader handles
+PNG_MODES = {0: (1, "L"), 2: (3, "RGB"), 3: (1, "P"), 4: (2, "LA"), 6: (4, "RGBA")}
+WRITER_COLOR_TYPES = {"L": 0, "RGB": 2, "LA": 4, "RGBA": 6}
+
+def image_size(path):
+    """Return (width, height) from the file header without decoding pixels."""
+    with Image.open(path) as img:
+        return img.size
+
+def is_large(path, limit=LARGE_PIXELS):
+    width, height = image_size(path)
+    return width * height > limit
+
+def band_rows(row_bytes, align=1, budget=BAND_BYTES):
+    """Rows per band for a given decoded row size, rounded down to a multiple of align."""
+    rows = max(align, budget // max(1, row_bytes))
+    return rows - rows % align
+
+class PngBandReader:
+    """Decode a non-interlaced 8-bit PNG band by band.
+
+    Each band is decoded by Pillow from a small in-memory PNG that holds the previous band's last row
+    (unfiltered) followed by this band's filtered rows, so filters that look at the row above keep working.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        try:
+            self._read_header(path)
+        except Exception:
+            self._file.close()
+            raise
+        channels, self.mode = PNG_MODES[self.color_type]
+        self.stride = self.width * channels
+        self._inflater = zlib.decompressobj()
+        self._previous = None
+
+    def _read_header(self, path):
+        """Read up to the first IDAT chunk, keeping IHDR, PLTE and tRNS."""
+        if self._file.read(8) != PNG_SIGNATURE:
+            raise ValueError(f"{path} is not a PNG")
+        self._header = b""
+        self._extra_chunks = b""
+        while True:
+            tag, data = self._read_chunk()
+            if tag == b"IHDR":
+                self._header = data
+                self.width, self.height, bit_depth, self.color_type, _, _, interlace = \
+                    struct.unpack(">IIBBBBB", data)
+                if bit_depth != 8 or interlace or self.color_type not in PNG_MODES:
+                    raise ValueError(f"{path}: only non-interlaced 8-bit PNGs can be read in bands")
+            elif tag in (b"PLTE", b"tRNS"):
+                self._extra_chunks += png_chunk(tag, data)
+            elif tag == b"IDAT":
+                self._pending = data
+                break
+            elif tag == b"IEND":
+                raise ValueError(f"{path} has no image data")
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    def _read_chunk(self):
+        length, tag = struct.unpack(">I4s", self._file.read(8))
+        data = self._file.read(length)
+        self._file.read(4)  # CRC, checked by zlib/Pillow failing loudly on corrupt data instead
+        return tag, data
+
+    def _inflate(self, size):
+        """Return exactly size bytes of decompressed scanlines, reading IDAT chunks as needed."""
+        out = bytearray()
+        while len(out) < size:
+            if not self._pending:
+                tag, data = self._read_chunk()
+                if tag == b"IEND":
+                    break
+                if tag != b"IDAT":
+                    continue
+                self._pending = data
+            out += self._inflater.decompress(self._pending, size - len(out))
+            self._pending = self._inflater.unconsumed_tail
+        if len(out) < size:
+            raise ValueError("PNG image data ended early")
+        return bytes(out)
+
+    def _decode(self, rows):
+        raw = self._inflate(rows * (self.stride + 1))
+        prefix, height = b"", rows
+        if self._previous is not None:
+            prefix, height = b"\x00" + self._previous, rows + 1
+        header = self._header[:4] + struct.pack(">I", height) + self._header[8:]
+        png = (PNG_SIGNATURE + png_chunk(b"IHDR", header) + self._extra_chunks
+               + png_chunk(b"IDAT", zlib.compress(prefix + raw, 0)) + png_chunk(b"IEND", b""))
+        band = Image.open(io.BytesIO(png))
+        band.load()
+        if prefix:
+            band = band.crop((0, 1, self.width, height))
+        # The decoded bytes of an 8-bit image are exactly its unfiltered scanline
+        self._previous = band.crop((0, rows - 1, self.width, rows)).tobytes()
+        return band
+
+    def bands(self, rows=None, align=1):
+        """Yield (top, image) for consecutive bands of `rows` rows (by default sized from BAND_BYTES)."""
+        rows = rows or band_rows(self.stride, align)
+        for top in range(0, self.height, rows):
+            yield top, self._decode(min(rows, self.height - top))
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def iter_bands(path, rows=None, align=1):
+    """Yield (top, image) bands of any image file.
+
+    8-bit non-interlaced PNGs are streamed; anything else is decoded whole and cut into bands,
+    which still bounds the memory of the per-band processing.
+    """
+    try:
+        reader = PngBandReader(path)
+    except ValueError:
+        with Image.open(path) as img:
+            img.load()
+            row_bytes = img.width * len(img.getbands())
+            rows = rows or band_rows(row_bytes, align)
+            for top in range(0, img.height, rows):
+                yield top, img.crop((0, top, img.width, min(img.height, top + rows)))
+        return
+    with reader:
+        yield from reader.bands(rows, align)
+
+class PngBandWriter:
+    """Encode a PNG band by band: rows are filtered (adaptively by default) and deflated as they arrive."""
+
+    def __init__(self, path, size, mode="RGBA", level=6, filter="adaptive"):
+        if mode not in WRITER_COLOR_TYPES:
+            raise ValueError(f"cannot stream-encode mode {mode}")
+        backends.require_numpy("Streaming PNG encoding")
+        self.path = path
+        self.width, self.height = size
+        self.mode = mode
+        self.filter = filter
+        self.rows_written = 0
+        self._bpp = len(mode)
+        self._previous = None
+        self._compressor = zlib.compressobj(level)
+        self._tmp_path = f"{path}.{os.getpid()}.tmp"
+        self._file = open(self._tmp_path, 'wb')
+        header = struct.pack(">IIBBBBB", self.width, self.height, 8, WRITER_COLOR_TYPES[mode], 0, 0, 0)
+        self._file.write(PNG_SIGNATURE + png_chunk(b"IHDR", header))
+
+    def write(self, band):
+        """Append a band (an image of the writer's mode and width) below the rows written so far."""
+        if band.mode != self.mode:
+            band = band.convert(self.mode)
+        rows = np.asarray(band).reshape(band.height, self.width * self._bpp)
+        # Adaptive filtering needs several times the input in temporaries, so filter a few rows at a time
+        step = band_rows(rows.shape[1], budget=FILTER_BYTES)
+        for start in range(0, len(rows), step):
+            chunk = rows[start:start + step]
+            if self._previous is None:
+                data = filter_rows(chunk, self._bpp, self.filter)
+            else:
+                # Filter with the previous row in place, then drop it again
+                data = filter_rows(np.vstack([self._previous, chunk]), self._bpp, self.filter)[rows.shape[1] + 1:]
+            self._previous = chunk[-1:].copy()
+            compressed = self._compressor.compress(data)
+            if compressed:
+                self._file.write(png_chunk(b"IDAT", compressed))
+        self.rows_written += band.height
+
+    def close(self):
+        """Finish the file and move it into place; an incomplete image is discarded."""
+        if self._file.closed:
+            return
+        complete = self.rows_written == self.height
+        if complete:
+            self._file.write(png_chunk(b"IDAT", self._compressor.flush()) + png_chunk(b"IEND", b""))
+        self._file.close()
+        if not complete:
+            os.remove(self._tmp_path)
+            raise ValueError(f"{self.path}: wrote {self.rows_written} of {self.height} rows")
+        os.replace(self._tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+            os.remove(self._tmp_path)
+
+def map_bands(input_path, output_path, func, mode="RGBA", rows=None):
+    """Stream input through func(band, top) -> band into a new PNG. func must not change band sizes."""
+    size = image_size(input_path)
+    with PngBandWriter(output_path, size, mode) as writer:
+        for top, band in iter_bands(input_path, rows):
+            writer.write(func(band, top))
+
+def reduce_factor(size, target, margin=REDUCE_MARGIN):
+    """Largest whole factor that keeps the smaller side at least margin x target."""
+    return max(1, min(size) // (target * margin))
+
+def load_reduced(path, target, margin=REDUCE_MARGIN):
+    """Decode a large source already shrunk toward target pixels on its shorter side.
+
+    JPEGs use draft mode (DCT scaling while decoding); PNGs are box-reduced band by band, which gives
+    exactly img.reduce(factor) while only ever holding one band of the full-size image.
+    """
+    with Image.open(path) as img:
+        if img.format == "JPEG":
+            img.draft("RGB", (target * margin, target * margin))
+            img.load()
+            factor = reduce_factor(img.size, target, margin)
+            return img.reduce(factor) if factor > 1 else img.copy()
+
+    factor = reduce_factor(image_size(path), target, margin)
+    reduced = None
+    for top, band in iter_bands(path, align=factor):
+        if band.mode == "P":
+            band = band.convert("RGBA")
+        small = band.reduce(factor) if factor > 1 else band
+        if reduced is None:
+            width, height = image_size(path)
+            reduced = Image.new(small.mode, (-(-width // factor), -(-height // factor)))
+        reduced.paste(small, (0, top // factor))
+    return reduced
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Per-stage tracing for the asset generators.
+Set ASSET_TRACE=report.json (or 1 for asset-trace.json) and every @traced generator records its wall time,
+CPU time, peak tracemalloc allocation, image dimensions and output bytes. The JSON report is written
+when the process exits; pool workers write <report>.<pid>.json, which the parent merges into its own
+report when it exits. ASSET_TRACE_PROFILE=stage.prof also keeps a cProfile dump of the slowest top-level
+stage across the parent and its workers. Without ASSET_TRACE the decorator adds a single flag check per call.
+"""
+
+from PIL import Image
+import atexit
+import cProfile
+import functools
+import glob
+import inspect
+import json
+import multiprocessing
+import multiprocessing.util
+import os
+import resource
+import sys
+import time
+import tracemalloc
+
+TRACE_ENV = "ASSET_TRACE"
+PROFILE_ENV = "ASSET_TRACE_PROFILE"
+DEFAULT_REPORT = "asset-trace.json"
+
+_enabled = False
+_report_path = None
+_profile_path = None
+_records = []
+_stack = []
+_slowest = {"seconds": -1.0, "stage": None, "profile": None}
+
+def enable(report_path=DEFAULT_REPORT, profile_path=None):
+    """Turn tracing on for this process and write the report (and profile) at exit."""
+    global _enabled, _report_path, _profile_path
+    if not _enabled:
+        atexit.register(write_report)
+    _enabled = True
+    _report_path = report_path
+    _profile_path = profile_path
+
+def is_enabled():
+    return _enabled
+
+def _stage_name(func):
+    module = os.path.splitext(os.path.basename(func.__code__.co_filename))[0]
+    return f"{module}.{func.__qualname__}"
+
+def _image_sizes(values):
+    """Dimensions of every image in values (images, or dicts/lists of images)."""
+    sizes = []
+    for value in values:
+        if isinstance(value, Image.Image):
+            sizes.append(list(value.size))
+        elif isinstance(value, dict):
+            sizes.extend(_image_sizes(value.values()))
+        elif isinstance(value, (list, tuple)):
+            sizes.extend(_image_sizes(value))
+    return sizes
+
+def _output_files(arguments):
+    """Files a stage writes, taken from its output_path / outputs arguments."""
+    if arguments.get("output_path"):
+        return [arguments["output_path"]]
+    if isinstance(arguments.get("outputs"), dict):
+        return list(arguments["outputs"].values())
+    return []
+
+def _describe_outputs(result, files):
+    """Return (output image sizes, output bytes) from the return value and any written files."""
+    sizes = _image_sizes([result])
+    written = 0
+    for path in files:
+        if os.path.exists(path):
+            written += os.path.getsize(path)
+            if not sizes or len(files) > 1:
+                with Image.open(path) as img:
+                    sizes.append(list(img.size))
+    return sizes, written or None
+
+def traced(func):
+    """Record one stage per call of func while tracing is enabled."""
+    name = _stage_name(func)
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return func(*args, **kwargs)
+
+        arguments = signature.bind_partial(*args, **kwargs).arguments
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+        # Keep the enclosing stage's peak before resetting it for this one
+        current, peak = tracemalloc.get_traced_memory()
+        if _stack:
+            _stack[-1]["max_traced"] = max(_stack[-1]["max_traced"], peak)
+        tracemalloc.reset_peak()
+        frame = {"entry_traced": current, "max_traced": current}
+        record = {
+            "stage": name,
+            "parent": _stack[-1]["index"] if _stack else None,
+            "depth": len(_stack),
+            "input_sizes": _image_sizes(arguments.values()),
+        }
+        frame["index"] = len(_records)
+        _records.append(record)
+        _stack.append(frame)
+
+        # Only one profiler can run at a time, so only top-level stages are profiled
+        profiler = cProfile.Profile() if _profile_path and len(_stack) == 1 else None
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            if profiler:
+                result = profiler.runcall(func, *args, **kwargs)
+            else:
+                result = func(*args, **kwargs)
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            _stack.pop()
+            peak = max(frame["max_traced"], tracemalloc.get_traced_memory()[1])
+            if _stack:
+                _stack[-1]["max_traced"] = max(_stack[-1]["max_traced"], peak)
+
+            record["wall_seconds"] = round(wall, 6)
+            record["cpu_seconds"] = round(cpu, 6)
+            record["peak_traced_bytes"] = peak - frame["entry_traced"]
+            record["max_rss_bytes"] = _max_rss_bytes()
+            if profiler and wall > _slowest["seconds"]:
+                _slowest.update(seconds=wall, stage=name, profile=profiler)
+
+        record["output_sizes"], record["output_bytes"] = _describe_outputs(result, _output_files(arguments))
+        return result
+
+    return wrapper
+
+def _max_rss_bytes():
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+def summary(records=None):
+    """Total wall and CPU time, and call count, per stage name (nested stages counted in their parents too)."""
+    totals = {}
+    for record in _records if records is None else records:
+        if "wall_seconds" not in record:
+            continue
+        total = totals.setdefault(record["stage"], {"calls": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0})
+        total["calls"] += 1
+        total["wall_seconds"] = round(total["wall_seconds"] + record["wall_seconds"], 6)
+        total["cpu_seconds"] = round(total["cpu_seconds"] + record["cpu_seconds"], 6)
+    return dict(sorted(totals.items(), key=lambda item: -item[1]["wall_seconds"]))
+
+class _Worker:
+    """Fork hook for multiprocessing workers (an object, since register_after_fork keeps a weak reference)."""
+
+    def __call__(self, _):
+        # Start with an empty trace instead of a copy of the parent's
+        _records.clear()
+        _stack.clear()
+        _slowest.update(seconds=-1.0, stage=None, profile=None)
+        if _enabled:
+            # Workers leave through os._exit, which skips atexit but runs multiprocessing finalizers
+            multiprocessing.util.Finalize(None, write_report, exitpriority=0)
+
+_worker = _Worker()
+multiprocessing.util.register_after_fork(_worker, _worker)
+
+def _process_path(path):
+    """Worker processes write next to the main report, suffixed with their pid."""
+    if path and multiprocessing.parent_process() is not None:
+        root, ext = os.path.splitext(path)
+        return f"{root}.{os.getpid()}{ext}"
+    return path
+
+def _worker_reports(path):
+    """Load, and remove, the reports this process's pool workers wrote next to path."""
+    root, ext = os.path.splitext(path)
+    reports = []
+    for worker_path in sorted(glob.glob(f"{glob.escape(root)}.*{ext}")):
+        if not worker_path[len(root) + 1:len(worker_path) - len(ext)].isdigit():
+            continue
+        with open(worker_path) as f:
+            report = json.load(f)
+        if report.get("parent_pid") == os.getpid():
+            reports.append(report)
+            os.remove(worker_path)
+    return reports
+
+def _keep_slowest_profile(workers):
+    """Dump or keep only the slowest profiled stage among this process and its workers; delete the rest."""
+    candidates = [{"stage": _slowest["stage"], "wall_seconds": round(_slowest["seconds"], 6), "profile": None}
+                  ] if _slowest["profile"] else []
+    candidates += [report["profiled_stage"] for report in workers if report["profiled_stage"]]
+    if not candidates:
+        return None
+    slowest = max(candidates, key=lambda candidate: candidate["wall_seconds"])
+    for candidate in candidates:
+        if candidate is not slowest and candidate["profile"] and os.path.exists(candidate["profile"]):
+            os.remove(candidate["profile"])
+    if slowest["profile"]:
+        os.replace(slowest["profile"], _profile_path)
+    else:
+        _slowest["profile"].dump_stats(_profile_path)
+    return {**slowest, "profile": _profile_path}
+
+def write_report(path=None):
+    """Write the JSON report (and the slowest stage's profile). Returns the report path, or None.
+
+    In a pool worker the report goes to <report>.<pid>.json; the parent folds those into its own report.
+    """
+    path = path or _process_path(_report_path)
+    if not path:
+        return None
+    is_worker = multiprocessing.parent_process() is not None
+    workers = _worker_reports(_report_path) if _report_path and not is_worker else []
+    records = [{**record, "pid": os.getpid()} for record in _records]
+    for worker in workers:
+        # Parent indices are positions in the worker's own list
+        offset = len(records)
+        records += [{**record, "parent": None if record["parent"] is None else record["parent"] + offset}
+                    for record in worker["stages"]]
+    if not records:
+        return None
+    report = {
+        "argv": sys.argv,
+        "pid": os.getpid(),
+        "stages": records,
+        "summary": summary(records),
+        "profiled_stage": None,
+    }
+    if is_worker:
+        report["parent_pid"] = os.getppid()
+        if _profile_path and _slowest["profile"]:
+            profile_path = _process_path(_profile_path)
+            _slowest["profile"].dump_stats(profile_path)
+            report["profiled_stage"] = {"stage": _slowest["stage"], "wall_seconds": round(_slowest["seconds"], 6),
+                                        "profile": profile_path}
+    else:
+        report["workers"] = [worker["pid"] for worker in workers]
+        if _profile_path:
+            report["profiled_stage"] = _keep_slowest_profile(workers)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+        f.write("\n")
+    return path
+
+if os.environ.get(TRACE_ENV):
+    value = os.environ[TRACE_ENV]
+    enable(DEFAULT_REPORT if value == "1" else value, os.environ.get(PROFILE_ENV))
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Watch the icon source, the generator modules and their color constants, and rebuild affected assets.
+A warm worker process keeps fonts, masks and rendered backgrounds loaded between rebuilds. Changed
+modules (and the modules importing them) are reloaded in place, and the build cache decides which
+outputs actually depend on what changed.
+"""
+
+import argparse
+import ast
+import importlib
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_MODULE = "pipeline"
+DEFAULT_INTERVAL = 0.1
+
+def local_imports(name):
+    """Names of the modules next to this file that module `name` imports."""
+    with open(os.path.join(SCRIPT_DIR, f"{name}.py")) as f:
+        tree = ast.parse(f.read())
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.add(node.module)
+    return {name for name in names if os.path.exists(os.path.join(SCRIPT_DIR, f"{name}.py"))}
+
+def module_graph(root=ROOT_MODULE, previous=None):
+    """Map every local module reachable from root to the local modules it imports.
+
+    A module that does not parse (mid-edit) keeps its imports from the previous graph.
+    """
+    graph = {}
+    pending = [root]
+    while pending:
+        name = pending.pop()
+        if name not in graph:
+            try:
+                graph[name] = local_imports(name)
+            except SyntaxError:
+                graph[name] = (previous or {}).get(name, set())
+            pending.extend(graph[name])
+    return graph
+
+def affected_modules(graph, changed):
+    """changed plus every module that imports one of them, dependencies first (reload order)."""
+    affected = set(changed)
+    grew = True
+    while grew:
+        grew = False
+        for name, deps in graph.items():
+            if name not in affected and deps & affected:
+                affected.add(name)
+                grew = True
+
+    order = []
+    def visit(name):
+        if name in order:
+            return
+        for dep in sorted(graph.get(name, ())):
+            visit(dep)
+        order.append(name)
+    for name in sorted(graph):
+        visit(name)
+    return [name for name in order if name in affected]
+
+def snapshot(paths):
+    """mtime and size per path; missing files are None."""
+    state = {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            state[path] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            state[path] = None
+    return state
+
+def watched_paths(graph):
+    """The icon source, the original artwork if present, and every generator module.
+
+    Files the pipeline writes itself are left out (the icon source is one when it is cleaned from the
+    original artwork), so a rebuild never shows up as another change.
+    """
+    import create_clean_icons
+    import pipeline
+    outputs = {target.output for target in pipeline.asset_graph()}
+    paths = {}
+    if pipeline.SOURCE_PATH not in outputs:
+        paths[pipeline.SOURCE_PATH] = None
+    if os.path.exists(create_clean_icons.INPUT_IMAGE):
+        paths[create_clean_icons.INPUT_IMAGE] = None
+    for name in graph:
+        paths[os.path.join(SCRIPT_DIR, f"{name}.py")] = name
+    return paths
+
+def _worker(conn, options):
+    """Warm rebuild loop: receive changed module names, reload them, rebuild stale targets."""
+    sys.path.insert(0, SCRIPT_DIR)
+    import buildcache
+    import pipeline
+
+    graph = module_graph()
+    stale = set()
+    cache = buildcache.BuildCache(force=options["force"])
+    while True:
+        changed = conn.recv()
+        if changed is None:
+            break
+        start = time.perf_counter()
+        try:
+            # A module whose reload failed stays stale until it reloads cleanly
+            stale.update(changed)
+            for name in affected_modules(graph, stale):
+                importlib.reload(sys.modules[name])
+                stale.discard(name)
+            graph = module_graph(previous=graph)
+
+            targets = pipeline.asset_graph(options["inpaint"], options["antialias"])
+            status = pipeline.run_graph(targets, 1, cache)
+            cache.save()
+            cache.force = False
+            conn.send(("ok", status, time.perf_counter() - start))
+        except Exception:
+            conn.send(("error", traceback.format_exc(), time.perf_counter() - start))
+
+def _start_worker(options):
+    parent_conn, child_conn = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=_worker, args=(child_conn, options), daemon=True)
+    process.start()
+    return process, parent_conn
+
+def _report(result, detected_at):
+    kind, payload, build_seconds = result
+    latency = (time.perf_counter() - detected_at) * 1000
+    if kind == "error":
+        print(payload.rstrip())
+        print(f"Rebuild failed after {latency:.0f} ms; waiting for the next change")
+        return
+    built = [name for name, state in payload.items() if state == "built"]
+    print(f"Rebuilt {', '.join(built) if built else 'nothing'} "
+          f"({build_seconds * 1000:.0f} ms build, {latency:.0f} ms after the change)", flush=True)
+
+def watch(options, interval=DEFAULT_INTERVAL):
+    """Poll the watched files and send each settled set of changes to the warm worker."""
+    graph = module_graph()
+    paths = watched_paths(graph)
+    process, conn = _start_worker(options)
+
+    print("Initial build...", flush=True)
+    conn.send([])
+    _report(conn.recv(), time.perf_counter())
+    state = snapshot(paths)
+    print(f"Watching {len(paths)} files (Ctrl+C to stop)", flush=True)
+
+    try:
+        while True:
+            time.sleep(interval)
+            current = snapshot(paths)
+            if current == state:
+                continue
+            detected_at = time.perf_counter()
+            # Editors often save in several writes; wait until the files stop changing
+            while True:
+                time.sleep(interval / 2)
+                settled = snapshot(paths)
+                if settled == current:
+                    break
+                current = settled
+
+            changed = [path for path in paths if current[path] != state[path]]
+            for path in changed:
+                print(f"Changed: {os.path.relpath(path, SCRIPT_DIR)}")
+            modules = [paths[path] for path in changed if paths[path]]
+
+            if not process.is_alive():
+                process, conn = _start_worker(options)
+                # A fresh worker imports everything anew
+                modules = []
+            conn.send(modules)
+            try:
+                _report(conn.recv(), detected_at)
+            except EOFError:
+                print("Worker exited; restarting on the next change")
+
+            # A new module import may add files to watch; our own writes are not changes
+            graph = module_graph(previous=graph)
+            paths = watched_paths(graph)
+            state = snapshot(paths)
+    except KeyboardInterrupt:
+        print("\nStopped")
+    finally:
+        if process.is_alive():
+            conn.send(None)
+            process.join(timeout=5)
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild icons and screenshots whenever their inputs change.")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL, help="polling interval in seconds")
+    parser.add_argument("--force", action="store_true", help="rebuild everything once at start")
+    parser.add_argument("--inpaint", action="store_true", help="inpaint the watermark when cleaning the source")
+    parser.add_argument("--antialias", type=int, default=1, metavar="N", help="supersample icon masks N times")
+    args = parser.parse_args()
+
+    watch({"force": args.force, "inpaint": args.inpaint, "antialias": args.antialias}, args.interval)
+
+if __name__ == "__main__":
+    main()